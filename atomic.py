@@ -0,0 +1,21 @@
+import os
+import contextlib
+
+@contextlib.contextmanager
+def replacing(path, mode = 'wb', **kwargs):
+    """
+    Open a temporary file next to path for writing. It replaces path when
+    the block ends without an error and is removed otherwise, so path is
+    never left half written and an older path is kept on failure.
+
+        with atomic.replacing(out, 'w') as write_obj:
+            write_obj.write(text)
+    """
+    temp = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(temp, mode, **kwargs) as write_obj:
+            yield write_obj
+        os.replace(temp, path)
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
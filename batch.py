@@ -0,0 +1,115 @@
+import os
+import glob
+
+# operation: (tools function, output extension, options it takes)
+OPERATIONS = {
+    'convert-to-gpx': ('convert_to_gpx', '.gpx', ()),
+    'smooth': ('smooth_func', '.kml', ()),
+    'optimize': ('optimize_func', '.kml', ('mode', 'target', 'area')),
+    'mile-markers': ('mile_markers', '.kml', ('reverse', 'interval', 'unit')),
+    'csv': ('csv_func', '.csv', ('timezone',)),
+    'to-binary': ('to_binary', '.mtb', ()),
+}
+EXTENSIONS = ('.gpx', '.kml', '.mtb')
+
+class BatchError(Exception):
+    pass
+
+def find_inputs(inputs) -> list:
+    """
+    The track files (extensions in EXTENSIONS: gpx, kml and binary .mtb)
+    named by inputs, which may be files, directories (their track files,
+    not recursive) or glob patterns. Sorted, each once.
+    """
+    paths = []
+    for i in inputs:
+        if os.path.isdir(i):
+            matches = [os.path.join(i, j) for j in os.listdir(i)]
+        elif os.path.isfile(i):
+            matches = [i]
+        else:
+            matches = glob.glob(i)
+            if not matches:
+                raise BatchError(f'no such file, directory or match: {i}')
+        paths.extend(j for j in matches
+                if os.path.isfile(j) and os.path.splitext(j)[1] in EXTENSIONS)
+    return sorted(set(paths))
+
+def out_path(path, out_dir, operation) -> str:
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(out_dir, stem + OPERATIONS[operation][1])
+
+def up_to_date(path, out) -> bool:
+    return os.path.isfile(out) and os.path.getmtime(out) >= os.path.getmtime(path)
+
+def _describe(e):
+    return f'{type(e).__name__}: {e}' if str(e) else type(e).__name__
+
+def _run_one(job):
+    """
+    Apply one operation to one file. Runs in a worker process, so errors
+    are returned, not raised, and the run goes on with the other files.
+    The writers replace out only once it is complete (see atomic), so a
+    failed file leaves whatever out was before.
+    """
+    operation, path, out, options, verbose = job
+    import tools
+    func = getattr(tools, OPERATIONS[operation][0])
+    try:
+        func(path = path, out = out, verbose = verbose, **options)
+    except Exception as e:
+        return path, out, 'failed', _describe(e)
+    return path, out, 'done', None
+
+def run_batch(operation, inputs, out_dir, workers = None, force = False,
+        verbose = False, **options):
+    """
+    Apply operation (a key of OPERATIONS) to every file find_inputs gives
+    for inputs, writing out_path(path, out_dir, operation) for each.
+
+    Files whose output is newer than the input are skipped unless force.
+    Files that would write the same output (same name in two directories,
+    or x.gpx and x.kml) all fail rather than overwrite each other.
+    The rest run on a pool of workers processes (all cores by default; 1
+    runs them in this process). Options the operation does not take are
+    ignored.
+
+    Yields (path, out, status, error) as files finish, status being one of
+    'done', 'skipped' or 'failed'.
+    """
+    if operation not in OPERATIONS:
+        raise BatchError(f'unknown operation {operation}')
+    accepted = OPERATIONS[operation][2]
+    options = {k: v for k, v in options.items() if k in accepted}
+    os.makedirs(out_dir, exist_ok = True)
+    jobs = []
+    paths = find_inputs(inputs)
+    outs = [os.path.realpath(out_path(i, out_dir, operation)) for i in paths]
+    shared = {i for i in outs if outs.count(i) > 1}
+    for path in paths:
+        out = out_path(path, out_dir, operation)
+        if os.path.realpath(out) in shared:
+            yield path, out, 'failed', 'another input has the same output name'
+        elif os.path.realpath(out) == os.path.realpath(path):
+            yield path, out, 'failed', 'output would overwrite the input'
+        elif not force and up_to_date(path, out):
+            yield path, out, 'skipped', None
+        else:
+            jobs.append((operation, path, out, options, verbose))
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(jobs))
+    if workers < 2:
+        for job in jobs:
+            yield _run_one(job)
+        return
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    with ProcessPoolExecutor(max_workers = workers) as executor:
+        futures = {executor.submit(_run_one, job): job for job in jobs}
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e:
+                # the worker itself died, e.g. killed for memory
+                job = futures[future]
+                yield job[1], job[2], 'failed', _describe(e)
@@ -0,0 +1,218 @@
+import os
+import sys
+import gc
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+
+import numpy as np
+
+import gpx
+import kml
+import optimize
+import simplify
+import smooth
+import tools
+import xmlstream
+from track import Track
+
+SIZES = [10000, 100000, 1000000]
+FORMATS = ['gpx', 'kml']
+STAGES = ['parse', 'mile_markers', 'simplify', 'smooth', 'optimize',
+        'cluster', 'merge', 'write']
+START_TIME = np.datetime64('2024-06-01T15:00:00', 'ms')
+CHUNK_SIZE = 100000
+METERS_PER_DEGREE = 111319.49
+
+class BenchmarkError(Exception):
+    pass
+
+def make_route(n, seed = 0):
+    """
+    A synthetic hike: a walk at about 1.4 m/s sampled every second, with a
+    slowly wandering heading and a rolling elevation profile. Returns
+    (lat, lon, ele, time) columns.
+    """
+    rng = np.random.default_rng(seed)
+    heading = np.cumsum(rng.normal(0, 0.05, n))
+    step = np.abs(rng.normal(1.4, 0.3, n))
+    north = np.cumsum(step * np.cos(heading))
+    east = np.cumsum(step * np.sin(heading))
+    lat = 47.44 + north / METERS_PER_DEGREE
+    lon = -121.67 + east / (METERS_PER_DEGREE * np.cos(np.radians(lat)))
+    ele = 400 + np.cumsum(rng.normal(0, 0.2, n)) + 20 * np.sin(np.arange(n) / 900)
+    time_ = START_TIME + np.arange(n).astype('timedelta64[s]').astype('timedelta64[ms]')
+    return lat, lon, ele, time_
+
+def record(route, noise = 3, seed = 0) -> Track:
+    """
+    One GPS recording of route: every fix is off by about noise meters.
+    """
+    lat, lon, ele, time_ = route
+    rng = np.random.default_rng(seed)
+    n = len(lat)
+    return Track(
+            name = f'recording-{seed}',
+            lat = np.round(lat + rng.normal(0, noise, n) / METERS_PER_DEGREE, 10),
+            lon = np.round(lon + rng.normal(0, noise, n) / METERS_PER_DEGREE /
+                np.cos(np.radians(lat)), 10),
+            ele = np.round(ele + rng.normal(0, noise, n), 2),
+            time = time_)
+
+def _chunks(n):
+    for start in range(0, n, CHUNK_SIZE):
+        yield start, min(start + CHUNK_SIZE, n)
+
+def write_gpx(track, path):
+    with xmlstream.XmlStreamWriter(path, gpx.make_write_root()) as writer:
+        writer.start('trk')
+        writer.start('name')
+        writer.text(track.name)
+        writer.end()
+        gpx.write_trkseg(writer, track)
+
+def write_kml(track, path):
+    # kml has no times; leaving them out spares converting them per point
+    track = Track(name = track.name, lat = track.lat, lon = track.lon, ele = track.ele)
+    with xmlstream.XmlStreamWriter(path, kml.make_write_root()) as writer:
+        kml.write_line(writer, track.name,
+                (track.points[start:end] for start, end in _chunks(len(track))))
+
+def make_file(n, format_, directory, seed = 0) -> str:
+    """
+    Path of a synthetic recording of n points in format_ ('gpx' or 'kml'),
+    written to directory unless it is already there.
+    """
+    if format_ not in FORMATS:
+        raise BenchmarkError(f'unknown format {format_}')
+    path = os.path.join(directory, f'synthetic_{n}_{seed}.{format_}')
+    if not os.path.isfile(path):
+        track = record(make_route(n, seed = seed), seed = seed)
+        if format_ == 'gpx':
+            write_gpx(track, path)
+        else:
+            write_kml(track, path)
+    return path
+
+def measure(func, memory = True) -> dict:
+    """
+    Wall and CPU seconds of one call of func, and with memory the peak of
+    the memory traced by tracemalloc during a second call (tracing slows
+    the call down, so the two are not timed together).
+    """
+    gc.collect()
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    func()
+    result = {'seconds': time.perf_counter() - wall,
+            'cpu_seconds': time.process_time() - cpu,
+            'peak_bytes': None}
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            func()
+            result['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+def _stages(path, n, seed, stages = STAGES):
+    """
+    (name, func) for every stage in stages. The transforms share the track
+    parsed once here, as a subcommand would.
+    """
+    track = tools.tracks_from_file(path)[0]
+    points = track['points']
+    others = []
+    if 'merge' in stages:
+        # two more recordings of the route, only built when needed
+        others = [[record(make_route(n, seed = seed), seed = seed + i)]
+                for i in (1, 2)]
+
+    def write():
+        root = kml.make_write_root()
+        root.append(kml.make_line(name = 'benchmark', points = points))
+        tools.write_to_path(root = root, path = os.devnull)
+
+    return [(name, func) for name, func in [
+        ('parse', lambda: tools.tracks_from_file(path)),
+        ('mile_markers', lambda: tools.create_mile_markers(points)),
+        ('simplify', lambda: simplify.simplify(points)),
+        ('smooth', lambda: smooth.process(
+            points = points, maxdistance = 300, maxinterval = 5)),
+        ('optimize', lambda: optimize.optimize_points(points)),
+        ('cluster', lambda: tools.cluster_it(
+            points, cluster_distance = 20, max_iterations = 1000)),
+        ('merge', lambda: tools.merge_lines([[track]] + others)),
+        ('write', write),
+    ] if name in stages]
+
+def run(sizes = SIZES, formats = FORMATS, stages = STAGES, directory = '.',
+        memory = True, seed = 0, verbose = False) -> dict:
+    """
+    Time every stage on a synthetic file of each size and format. Returns
+    the report as a dict ready for json.
+    """
+    results = []
+    for n in sizes:
+        for format_ in formats:
+            path = make_file(n, format_, directory, seed = seed)
+            for name, func in _stages(path, n, seed, stages = stages):
+                if verbose:
+                    print(f'{format_} {n} {name}', file = sys.stderr)
+                result = measure(func, memory = memory)
+                result.update(stage = name, format = format_, points = n,
+                        file_bytes = os.path.getsize(path),
+                        points_per_second = n / result['seconds']
+                            if result['seconds'] else None)
+                results.append(result)
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'results': results,
+    }
+
+def _get_args():
+    parser = argparse.ArgumentParser(
+            description = 'time parsing, transforms and writing on synthetic tracks')
+    parser.add_argument("--sizes", '-n', type = int, nargs = '+', default = SIZES,
+            help="number of points of each synthetic track")
+    parser.add_argument("--formats", '-f', nargs = '+', default = FORMATS,
+            choices = FORMATS)
+    parser.add_argument("--stages", '-s', nargs = '+', default = STAGES,
+            choices = STAGES)
+    parser.add_argument("--dir", '-d', default = '.',
+            help="where the synthetic files are written and reused")
+    parser.add_argument("--out", '-o',
+            help="json report path, stdout if not given")
+    parser.add_argument("--no-memory", action = 'store_true',
+            help="skip the tracemalloc pass")
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--verbose", '-v',  action ='store_true')
+    return parser.parse_args()
+
+def main():
+    args = _get_args()
+    os.makedirs(args.dir, exist_ok = True)
+    report = run(
+            sizes = args.sizes,
+            formats = args.formats,
+            stages = args.stages,
+            directory = args.dir,
+            memory = not args.no_memory,
+            seed = args.seed,
+            verbose = args.verbose)
+    if args.out:
+        with open(args.out, 'w') as write_obj:
+            json.dump(report, write_obj, indent = 2)
+    else:
+        json.dump(report, sys.stdout, indent = 2)
+        print()
+
+if __name__== '__main__':
+    main()
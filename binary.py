@@ -0,0 +1,139 @@
+import os
+import struct
+
+import numpy as np
+
+import atomic
+from track import Track, TIME_DTYPE
+
+EXTENSION = '.mtb'
+MAGIC = b'MAPTRK\x00\x00'
+VERSION = 1
+# magic, version, reserved, tracks, points, segments, bytes of names
+HEADER = struct.Struct('<8sIIQQQQ')
+HAS_NAME = 1
+HAS_ELE = 2
+HAS_TIME = 4
+
+class BinaryTrackError(Exception):
+    pass
+
+def _layout(n_tracks, n_points, n_segments):
+    """
+    Byte offset of every block, in file order, and the offset where the
+    names start. Every block is 8-byte values, so all stay aligned.
+    """
+    sizes = [
+        ('track_offsets', n_tracks + 1),
+        ('segment_offsets', n_tracks + 1),
+        ('name_offsets', n_tracks + 1),
+        ('flags', n_tracks),
+        ('segments', n_segments),
+        ('lat', n_points),
+        ('lon', n_points),
+        ('ele', n_points),
+        ('time', n_points),
+    ]
+    offsets = {}
+    offset = HEADER.size
+    for name, count in sizes:
+        offsets[name] = offset
+        offset += 8 * count
+    return offsets, offset
+
+def write_tracks(path, tracks):
+    """
+    Write tracks (track.Track objects) to path in the binary track format:
+
+        header       magic, version and the counts below
+        offsets      int64 tables: first point, first segment and first
+                     name byte of every track, with one past the end last
+        flags        int64 per track: HAS_NAME | HAS_ELE | HAS_TIME
+        segments     int64 start of every segment, relative to its track
+        lat, lon     float64 degrees, all tracks one after the other
+        ele          float64 meters, NaN where missing
+        time         int64 ms since 1970 UTC, the NaT value where missing
+        names        utf-8
+
+    All values are little-endian, so read_tracks can map the columns
+    straight from the file.
+    """
+    names = [(i.name or '').encode('utf-8') for i in tracks]
+    lengths = [len(i) for i in tracks]
+    track_offsets = np.cumsum([0] + lengths, dtype = np.int64)
+    segment_offsets = np.cumsum([0] + [len(i.segments) for i in tracks],
+            dtype = np.int64)
+    name_offsets = np.cumsum([0] + [len(i) for i in names], dtype = np.int64)
+    flags = np.array([(HAS_NAME if i.name is not None else 0) |
+        (HAS_ELE if i.ele is not None else 0) |
+        (HAS_TIME if i.time is not None else 0) for i in tracks], dtype = np.int64)
+    header = HEADER.pack(MAGIC, VERSION, 0, len(tracks), int(track_offsets[-1]),
+            int(segment_offsets[-1]), int(name_offsets[-1]))
+    nat = np.datetime64('NaT', 'ms')
+    with atomic.replacing(path, 'wb') as write_obj:
+        write_obj.write(header)
+        for table in (track_offsets, segment_offsets, name_offsets, flags):
+            table.astype('<i8').tofile(write_obj)
+        for i in tracks:
+            i.segments.astype('<i8').tofile(write_obj)
+        for column in ('lat', 'lon', 'ele'):
+            for i in tracks:
+                values = getattr(i, column)
+                if values is None:
+                    values = np.full(len(i), np.nan)
+                values.astype('<f8').tofile(write_obj)
+        for i in tracks:
+            values = i.time
+            if values is None:
+                values = np.full(len(i), nat)
+            values.astype(TIME_DTYPE).view(np.int64).astype('<i8').tofile(write_obj)
+        write_obj.write(b''.join(names))
+
+def read_tracks(path) -> list:
+    """
+    The tracks of a file written by write_tracks. The columns are views of
+    a read-only np.memmap of the file, so opening it reads only the header
+    and tables; points are paged in when they are used.
+    """
+    if os.path.getsize(path) < HEADER.size:
+        raise BinaryTrackError(f'{path} is too short for a binary track file')
+    data = np.memmap(path, dtype = np.uint8, mode = 'r')
+    magic, version, _, n_tracks, n_points, n_segments, n_names = \
+        HEADER.unpack(data[:HEADER.size].tobytes())
+    if magic != MAGIC:
+        raise BinaryTrackError(f'{path} is not a binary track file')
+    if version != VERSION:
+        raise BinaryTrackError(f'{path} has unsupported version {version}')
+    offsets, names_start = _layout(n_tracks, n_points, n_segments)
+    if len(data) < names_start + n_names:
+        raise BinaryTrackError(f'{path} is truncated')
+
+    def block(name, count, dtype):
+        start = offsets[name]
+        return data[start:start + 8 * count].view(dtype)
+
+    track_offsets = block('track_offsets', n_tracks + 1, '<i8')
+    segment_offsets = block('segment_offsets', n_tracks + 1, '<i8')
+    name_offsets = block('name_offsets', n_tracks + 1, '<i8')
+    flags = block('flags', n_tracks, '<i8')
+    segments = block('segments', n_segments, '<i8')
+    lat = block('lat', n_points, '<f8')
+    lon = block('lon', n_points, '<f8')
+    ele = block('ele', n_points, '<f8')
+    time = block('time', n_points, '<M8[ms]')
+    names = data[names_start:names_start + n_names].tobytes()
+    tracks = []
+    for i in range(n_tracks):
+        start, end = int(track_offsets[i]), int(track_offsets[i + 1])
+        flag = int(flags[i])
+        name = None
+        if flag & HAS_NAME:
+            name = names[name_offsets[i]:name_offsets[i + 1]].decode('utf-8')
+        tracks.append(Track(
+            name = name,
+            lat = lat[start:end],
+            lon = lon[start:end],
+            ele = ele[start:end] if flag & HAS_ELE else None,
+            time = time[start:end] if flag & HAS_TIME else None,
+            segments = segments[segment_offsets[i]:segment_offsets[i + 1]]))
+    return tracks
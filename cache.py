@@ -0,0 +1,188 @@
+import os
+import json
+import hashlib
+import zipfile
+
+import numpy as np
+
+from track import Track, TIME_DTYPE
+
+VERSION = 1
+ENV_DIRECTORY = 'MAP_TOOLS_CACHE'
+ENV_MAX_MB = 'MAP_TOOLS_CACHE_MB'
+ENV_KEY = 'MAP_TOOLS_CACHE_KEY'
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+KEYS = ('stat', 'hash')
+READ_SIZE = 1 << 20
+
+class CacheError(Exception):
+    pass
+
+class ParseCache:
+    """
+    Parsed tracks of gpx and kml files kept in directory as .npz files, so
+    a file read before loads as arrays without parsing its xml again.
+
+    Entries are keyed by the path, modification time and size of the file
+    (key 'stat'), or by a hash of its content (key 'hash': slower, as the
+    file is read, but it survives copies and touches). Once the entries
+    take more than max_bytes the least recently used are removed; a hit
+    counts as a use.
+    """
+
+    def __init__(self, directory, max_bytes = DEFAULT_MAX_BYTES, key = 'stat'):
+        if key not in KEYS:
+            raise CacheError(f'key must be one of {KEYS}')
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.key = key
+        os.makedirs(directory, exist_ok = True)
+
+    def key_for(self, path) -> str:
+        h = hashlib.blake2b(digest_size = 20)
+        if self.key == 'hash':
+            with open(path, 'rb') as read_obj:
+                for chunk in iter(lambda: read_obj.read(READ_SIZE), b''):
+                    h.update(chunk)
+        else:
+            st = os.stat(path)
+            h.update(f'{os.path.realpath(path)}\0{st.st_mtime_ns}\0{st.st_size}'.encode())
+        return h.hexdigest()
+
+    def _entry(self, path):
+        return os.path.join(self.directory, self.key_for(path) + '.npz')
+
+    def get(self, path):
+        """
+        The list of Tracks cached for path, or None. An entry that cannot be
+        read (truncated, say) is removed, so the file is parsed and cached
+        again.
+        """
+        entry = self._entry(path)
+        try:
+            with np.load(entry, allow_pickle = False) as data:
+                if int(data['version']) != VERSION:
+                    return None
+                tracks = _from_arrays(data)
+        except FileNotFoundError:
+            return None
+        except (OSError, KeyError, ValueError, EOFError, zipfile.BadZipFile):
+            try:
+                os.remove(entry)
+            except FileNotFoundError:
+                pass
+            return None
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        return tracks
+
+    def put(self, path, tracks):
+        entry = self._entry(path)
+        temp = f'{entry}.{os.getpid()}.tmp'
+        try:
+            with open(temp, 'wb') as write_obj:
+                np.savez(write_obj, **_to_arrays(tracks))
+            if os.path.getsize(temp) > self.max_bytes:
+                return
+            os.replace(temp, entry)
+        finally:
+            if os.path.exists(temp):
+                os.remove(temp)
+        self.evict()
+
+    def entries(self) -> list:
+        """
+        (path, size, last use) of every entry, least recently used first.
+        """
+        final = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.npz'):
+                continue
+            p = os.path.join(self.directory, name)
+            try:
+                st = os.stat(p)
+            except FileNotFoundError:
+                continue
+            final.append((p, st.st_size, st.st_mtime_ns))
+        return sorted(final, key = lambda x: x[2])
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(i[1] for i in entries)
+        for p, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(p)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        for p, _, _ in self.entries():
+            try:
+                os.remove(p)
+            except FileNotFoundError:
+                pass
+
+def _to_arrays(tracks) -> dict:
+    """
+    The columns of all tracks concatenated, with offsets to split them and
+    the names and missing columns in a json header.
+    """
+    meta = {'names': [i.name for i in tracks],
+            'ele': [i.ele is not None for i in tracks],
+            'time': [i.time is not None for i in tracks]}
+    lengths = [len(i) for i in tracks]
+    nan = [np.full(n, np.nan) for n in lengths]
+    return {
+        'version': np.array(VERSION),
+        'meta': np.array(json.dumps(meta)),
+        'offsets': np.cumsum([0] + lengths),
+        'segment_offsets': np.cumsum([0] + [len(i.segments) for i in tracks]),
+        'lat': np.concatenate([i.lat for i in tracks] + [np.empty(0)]),
+        'lon': np.concatenate([i.lon for i in tracks] + [np.empty(0)]),
+        'ele': np.concatenate([n if i.ele is None else i.ele
+            for i, n in zip(tracks, nan)] + [np.empty(0)]),
+        'time': np.concatenate([n.astype(TIME_DTYPE) if i.time is None else i.time
+            for i, n in zip(tracks, nan)] + [np.empty(0, dtype = TIME_DTYPE)]),
+        'segments': np.concatenate([i.segments for i in tracks] +
+            [np.empty(0, dtype = np.int64)]),
+    }
+
+def _from_arrays(data) -> list:
+    meta = json.loads(str(data['meta']))
+    offsets = data['offsets']
+    segment_offsets = data['segment_offsets']
+    lat, lon, ele, time = data['lat'], data['lon'], data['ele'], data['time']
+    segments = data['segments']
+    tracks = []
+    for i, name in enumerate(meta['names']):
+        start, end = offsets[i], offsets[i + 1]
+        tracks.append(Track(
+            name = name,
+            lat = lat[start:end],
+            lon = lon[start:end],
+            ele = ele[start:end] if meta['ele'][i] else None,
+            time = time[start:end] if meta['time'][i] else None,
+            segments = segments[segment_offsets[i]:segment_offsets[i + 1]]))
+    return tracks
+
+def from_environment():
+    """
+    The ParseCache configured by the MAP_TOOLS_CACHE (directory),
+    MAP_TOOLS_CACHE_MB (size cap) and MAP_TOOLS_CACHE_KEY ('stat' or
+    'hash') environment variables, or None when caching is off, as it is by
+    default. Being in the environment, the settings reach worker processes.
+    """
+    directory = os.environ.get(ENV_DIRECTORY)
+    if not directory:
+        return None
+    max_bytes = DEFAULT_MAX_BYTES
+    max_mb = os.environ.get(ENV_MAX_MB)
+    if max_mb:
+        max_bytes = int(float(max_mb) * 1024 * 1024)
+    return ParseCache(directory, max_bytes = max_bytes,
+            key = os.environ.get(ENV_KEY) or 'stat')
@@ -0,0 +1,70 @@
+import numpy as np
+
+import geo
+import spatial
+
+MAX_TRIES = 10
+MAX_JUMP = 1000
+
+class ClusterError(ValueError):
+    pass
+
+def cluster_indices(lats, lons, cluster_distance, max_iterations,
+        index = None, max_jump = MAX_JUMP) -> tuple:
+    """
+    Walk a track cluster by cluster, starting from its first point.
+
+    Each cluster is every not yet clustered point within cluster_distance
+    meters of the current seed. The next seed is the remaining point nearest
+    to any member of that cluster; the walk stops after max_iterations
+    clusters, when no points remain, or when the next seed is more than
+    max_jump meters from the current one.
+
+    index is a spatial.SpatialIndex over the points, built here if not
+    given. Removal is tracked with a boolean mask that is passed to every
+    index query, so nothing is copied or rescanned between iterations.
+
+    Returns (clusters, remaining, current): a list of index arrays, the mask
+    of points not in any cluster and the index of the last seed.
+    """
+    if index is None:
+        index = spatial.SpatialIndex(lats, lons)
+    remaining = np.ones(len(lats), dtype = bool)
+    final = []
+    current = 0
+    counter = 0
+    while 1:
+        counter += 1
+        counter2 = 0
+        while 1:
+            counter2 += 1
+            clus, _ = index.within(
+                    latitude = lats[current],
+                    longitude = lons[current],
+                    radius = cluster_distance * counter2,
+                    mask = remaining)
+            if len(clus) > 0:
+                break
+            else:
+                print('did not find cluster, trying again')
+            if counter2 > MAX_TRIES:
+                raise ClusterError(
+                        f'tried {MAX_TRIES} times and could not find cluster')
+        final.append(clus)
+        remaining[clus] = False
+        if not remaining.any():
+            return final, remaining, current
+        distances, nearest = index.query(
+                lats[clus], lons[clus], k = 1, mask = remaining)
+        # the first member with the overall smallest distance, as the scan
+        # in tools.get_new_current does
+        n_current = int(nearest[int(np.argmin(distances[:, 0])), 0])
+        d_temp = geo.one_to_many(lats[current], lons[current],
+                geo.prepare(lats[n_current:n_current + 1],
+                    lons[n_current:n_current + 1]))[0]
+        if d_temp > max_jump:
+            return final, remaining, current
+        current = n_current
+        if counter == max_iterations:
+            break
+    return final, remaining, current
@@ -0,0 +1,101 @@
+import numpy as np
+
+EARTH_RADIUS = 6378.137 * 1000
+
+BLOCK_SIZE = 1024
+
+def prepare(latitudes, longitudes) -> tuple:
+    """
+    Convert latitude and longitude columns (in degrees) to radians and compute
+    the cosine of each latitude.
+
+    The batch functions below take the returned (lat, lon, cos_lat) tuple so
+    that the trigonometry for an array is done once, not once per pair.
+    """
+    lat = np.radians(np.asarray(latitudes, dtype = float))
+    lon = np.radians(np.asarray(longitudes, dtype = float))
+    return lat, lon, np.cos(lat)
+
+def _haversine(lat_1, lon_1, cos_1, lat_2, lon_2, cos_2):
+    a = np.sin((lat_1 - lat_2) / 2) ** 2 + \
+        np.sin((lon_1 - lon_2) / 2) ** 2 * cos_1 * cos_2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1)))
+
+def segment_distances(prepared) -> np.ndarray:
+    """
+    Haversine distance in meters between consecutive points; n points give
+    n - 1 distances.
+    """
+    lat, lon, cos_lat = prepared
+    return _haversine(lat[:-1], lon[:-1], cos_lat[:-1],
+            lat[1:], lon[1:], cos_lat[1:])
+
+def one_to_many(latitude, longitude, prepared) -> np.ndarray:
+    """
+    Haversine distance in meters from one point (in degrees) to every point
+    of a prepared array.
+    """
+    lat_1 = np.radians(latitude)
+    lat, lon, cos_lat = prepared
+    return _haversine(lat_1, np.radians(longitude), np.cos(lat_1),
+            lat, lon, cos_lat)
+
+def pairwise(prepared_1, prepared_2) -> np.ndarray:
+    """
+    Element-wise haversine distance between two prepared arrays of the same
+    length.
+    """
+    return _haversine(*prepared_1, *prepared_2)
+
+def many_to_many_blocks(prepared_1, prepared_2, block_size = BLOCK_SIZE):
+    """
+    Yield (start, block) where block holds the distances from rows
+    start:start + block_size of prepared_1 to every point of prepared_2.
+
+    Only one block of block_size * len(prepared_2) floats is alive at a time.
+    """
+    lat_1, lon_1, cos_1 = prepared_1
+    lat_2, lon_2, cos_2 = prepared_2
+    for start in range(0, len(lat_1), block_size):
+        stop = start + block_size
+        block = _haversine(
+                lat_1[start:stop, None], lon_1[start:stop, None],
+                cos_1[start:stop, None],
+                lat_2[None, :], lon_2[None, :], cos_2[None, :])
+        yield start, block
+
+def many_to_many(prepared_1, prepared_2, block_size = BLOCK_SIZE) -> np.ndarray:
+    """
+    Full (len(prepared_1), len(prepared_2)) distance matrix in meters,
+    computed blockwise.
+    """
+    final = np.empty((len(prepared_1[0]), len(prepared_2[0])))
+    for start, block in many_to_many_blocks(
+            prepared_1, prepared_2, block_size = block_size):
+        final[start:start + len(block)] = block
+    return final
+
+def nearest(prepared_1, prepared_2, block_size = BLOCK_SIZE) -> tuple:
+    """
+    For every point of prepared_1, the index of and distance to the nearest
+    point of prepared_2. Ties go to the lowest index.
+    """
+    n = len(prepared_1[0])
+    indices = np.zeros(n, dtype = np.int64)
+    distances = np.full(n, np.inf)
+    if len(prepared_2[0]) == 0:
+        return indices - 1, distances
+    for start, block in many_to_many_blocks(
+            prepared_1, prepared_2, block_size = block_size):
+        index = np.argmin(block, axis = 1)
+        indices[start:start + len(block)] = index
+        distances[start:start + len(block)] = block[np.arange(len(block)), index]
+    return indices, distances
+
+def unit_vectors(prepared) -> np.ndarray:
+    """
+    (n, 3) earth-centered, earth-fixed coordinates on the unit sphere.
+    """
+    lat, lon, cos_lat = prepared
+    return np.column_stack(
+            (cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
@@ -5,11 +5,23 @@ except ImportError:
 
 class KmlToGpxError(Exception):
     pass
-import tools
 
 import datetime
+from array import array
 from datetime import timezone
-import pytz
+import numpy as np
+
+import track
+
+GPX_NAMESPACE = '{http://www.topografix.com/GPX/1/1}'
+TRK = GPX_NAMESPACE + 'trk'
+TRKSEG = GPX_NAMESPACE + 'trkseg'
+TRKPT = GPX_NAMESPACE + 'trkpt'
+WPT = GPX_NAMESPACE + 'wpt'
+ELE = GPX_NAMESPACE + 'ele'
+TIME = GPX_NAMESPACE + 'time'
+NAME = GPX_NAMESPACE + 'name'
+CHUNK_SIZE = 100000
 
 def _make_time_from_string(s, convert_timezone = 'US/Pacific'):
     
@@ -17,35 +29,186 @@ def _make_time_from_string(s, convert_timezone = 'US/Pacific'):
     dt = datetime.datetime(dt.year, dt.month, dt.day, dt.hour, dt.minute, dt.second, 
             tzinfo = timezone.utc)
     if convert_timezone:
+        import pytz
         dt = dt.astimezone(pytz.timezone(f'{convert_timezone}'))
     return dt
 
+def parse_times(times) -> np.ndarray:
+    """
+    datetime64[ms] UTC column from a list of ISO-8601 time strings, None
+    where a point has no time.
+
+    Handles fractional seconds and a Z, +hh:mm or +hhmm suffix. The strings
+    are only trimmed here; numpy parses them all in one call, and offsets
+    are applied as one array subtraction. Converting to a local timezone is
+    left to whoever writes the times out (see track.local_times).
+    """
+    stamps = []
+    offsets = None
+    for counter, s in enumerate(times):
+        if s is None:
+            stamps.append('NaT')
+            continue
+        s = s.strip()
+        if s[-1] == 'Z':
+            stamps.append(s[:-1])
+            continue
+        if len(s) > 16 and s[-3] == ':' and s[-6] in '+-':
+            split = -6
+        elif len(s) > 16 and s[-5] in '+-' and s[-4:].isdigit():
+            split = -5
+        else:
+            stamps.append(s)
+            continue
+        if offsets is None:
+            offsets = np.zeros(len(times), dtype = np.int64)
+        minutes = int(s[split + 1:split + 3]) * 60 + int(s[-2:])
+        offsets[counter] = -minutes if s[split] == '-' else minutes
+        stamps.append(s[:split])
+    column = np.array(stamps, dtype = track.TIME_DTYPE)
+    if offsets is not None:
+        column = column - offsets.astype('timedelta64[m]')
+    return column
+
+def _release(element):
+    """
+    Free an element iterparse has finished with, and with lxml also the
+    already processed siblings before it.
+    """
+    element.clear()
+    if hasattr(element, 'getprevious'):
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+
+def iter_gpx(path):
+    """
+    Single iterparse pass over a gpx file that yields, in document order,
+    ('waypoint', None, point) for every wpt, point being a {'name',
+    'points'} dict as kml.get_points makes, ('segment', track_counter,
+    segment) for every trkseg, segment being a track.Track, and ('track',
+    track_counter, name) at the end of every trk.
+
+    Each trkpt is read into flat buffers and released as soon as it ends, so
+    memory is bounded by the largest segment rather than the document.
+    """
+    track_counter = -1
+    name = None
+    in_track = False
+    in_segment = False
+    for event, element in etree.iterparse(path, events = ('start', 'end')):
+        tag = element.tag
+        if event == 'start':
+            if tag == TRK:
+                track_counter += 1
+                name = f'track_{track_counter}'
+                in_track = True
+            elif tag == TRKSEG:
+                in_segment = True
+                lats = array('d')
+                lons = array('d')
+                eles = array('d')
+                times = []
+            continue
+        if tag == TRKPT:
+            elevation = np.nan
+            the_time = None
+            for child in element:
+                if child.tag == ELE:
+                    elevation = float(child.text)
+                elif child.tag == TIME:
+                    the_time = child.text
+            lats.append(float(element.get('lat')))
+            lons.append(float(element.get('lon')))
+            eles.append(elevation)
+            times.append(the_time)
+            _release(element)
+        elif tag == WPT:
+            yield 'waypoint', None, _read_waypoint(element)
+            _release(element)
+        elif tag == NAME and in_track and not in_segment:
+            name = element.text
+        elif tag == TRKSEG:
+            in_segment = False
+            yield 'segment', track_counter, track.Track(
+                    name = name,
+                    lat = np.frombuffer(lats),
+                    lon = np.frombuffer(lons),
+                    ele = np.frombuffer(eles),
+                    time = parse_times(times))
+            _release(element)
+        elif tag == TRK:
+            in_track = False
+            yield 'track', track_counter, name
+            _release(element)
+
+def _read_waypoint(element):
+    name = None
+    elevation = None
+    for child in element:
+        if child.tag == ELE:
+            elevation = float(child.text)
+        elif child.tag == NAME:
+            name = child.text
+    return {'name': name,
+            'points': (float(element.get('lat')), float(element.get('lon')),
+                elevation)}
+
+def read_waypoints(path) -> list:
+    """
+    The wpt of a gpx file, read up to its first rte or trk: gpx puts the
+    waypoints first, so the tracks are not parsed.
+    """
+    final = []
+    for event, element in etree.iterparse(path, events = ('start', 'end')):
+        if event == 'start':
+            if element.tag in (TRK, GPX_NAMESPACE + 'rte'):
+                break
+            continue
+        if element.tag == WPT:
+            final.append(_read_waypoint(element))
+            _release(element)
+    return final
+
+def iter_segments(path, verbose = False):
+    """
+    Stream a gpx file one trkseg at a time.
+
+    Yields (track_counter, segment) where segment is a track.Track named
+    after its trk; nothing but the current segment is held in memory.
+    """
+    for kind, track_counter, value in iter_gpx(path):
+        if kind == 'segment':
+            yield track_counter, value
+
 def tracks_from_gpx(path, verbose = False):
-    tree = tools.get_tree(path = path)
-    trk =   tree.findall('.//{http://www.topografix.com/GPX/1/1}trk')  
     final = []
-    for counter, i in enumerate(trk):
-        name = f'track_{counter}'
-        for j in i.iter('{http://www.topografix.com/GPX/1/1}name'):
-            name = j.text
-        d = {'name':name, 'points':[]}
-        trksegs = i.findall('{http://www.topografix.com/GPX/1/1}trkseg')
-        for j in trksegs:
-            trackpoints = j.findall('{http://www.topografix.com/GPX/1/1}trkpt')
-            for trackpoint in trackpoints:
-                ele = trackpoint.findall('{http://www.topografix.com/GPX/1/1}ele')
-                elevation = 0
-                if ele:
-                    elevation = float(ele[0].text)
-                the_time = trackpoint.findall('{http://www.topografix.com/GPX/1/1}time')
-                if the_time:
-                    the_time = _make_time_from_string(the_time[0].text)
-                else:
-                    the_time = None
-                d['points'].append((float(trackpoint.get('lat')), float(trackpoint.get('lon')), elevation, the_time))
-        final.append(d)
+    segments = []
+    for kind, track_counter, value in iter_gpx(path):
+        if kind == 'segment':
+            segments.append(value)
+            continue
+        if kind == 'waypoint':
+            continue
+        final.append(join_segments(name = value, segments = segments))
+        segments = []
     return final
 
+def join_segments(name, segments):
+    if not segments:
+        return track.Track(name = name, lat = [], lon = [], ele = [],
+                time = np.array([], dtype = track.TIME_DTYPE))
+    if len(segments) == 1:
+        segment = segments[0]
+        segment.name = name
+        return segment
+    return track.Track(
+            name = name,
+            lat = np.concatenate([i.lat for i in segments]),
+            lon = np.concatenate([i.lon for i in segments]),
+            ele = np.concatenate([i.ele for i in segments]),
+            time = np.concatenate([i.time for i in segments]),
+            segments = np.cumsum([0] + [len(i) for i in segments[:-1]]))
+
 def make_write_root()-> object:
     root = etree.Element("gpx", 
             creator = "GPSMAP 64st", version = "1.1", xmlns= "http://www.topografix.com/GPX/1/1")
@@ -53,7 +216,7 @@ def make_write_root()-> object:
 
 def add_wpx(lattitude, longitude, name, elevation = None):
     wpt = etree.Element("wpt", lat=str(lattitude), lon=str(longitude))
-    if elevation:
+    if elevation is not None:
         ele = etree.Element("ele")
         ele.text = str(elevation)
     name_element = etree.Element("name")
@@ -61,19 +224,25 @@ def add_wpx(lattitude, longitude, name, elevation = None):
     sym = etree.Element("sym")
     sym.text = "Residence"
 
-    if elevation:
+    if elevation is not None:
         wpt.append(ele)
     wpt.append(name_element)
     wpt.append(sym)
     return wpt
 
 
-def make_trkpt(lattitude:float, longitude:float, elevation:float)->object:
+def make_trkpt(lattitude:float, longitude:float, elevation:float = None,
+        time = None)->object:
     trkpt = etree.Element("trkpt", lat=str(lattitude), lon = str(longitude) )
-    if elevation:
+    if elevation is not None:
         ele = etree.Element("ele")
         ele.text = str(elevation)
         trkpt.append(ele)
+    if time is not None:
+        time_element = etree.Element("time")
+        time_element.text = format_times(
+                np.array([track._to_datetime64(time)], dtype = track.TIME_DTYPE))[0]
+        trkpt.append(time_element)
     return trkpt
 
 def make_trk_element(name):
@@ -91,8 +260,77 @@ def make_trkseg(coordinates:str)->object:
         trkpt = make_trkpt(
                 lattitude =i[0],
                 longitude = i[1],
-                elevation = i[2],
+                elevation = i[2] if len(i) > 2 else None,
+                time = i[3] if len(i) > 3 else None,
                 )
         trkseg.append(trkpt)
     return trkseg
 
+def _time_unit(times):
+    # whole seconds are written without a fraction, as devices write them
+    times = times[~np.isnat(times)]
+    return 'ms' if np.any(times.astype(np.int64) % 1000) else 's'
+
+def format_times(times, unit = None) -> list:
+    """
+    gpx time strings (UTC, with a Z) of a datetime64 column, None for NaT.
+    unit is 's' or 'ms', by default 'ms' only if a time has a fraction.
+    """
+    times = np.asarray(times, dtype = track.TIME_DTYPE)
+    missing = np.isnat(times)
+    strings = np.datetime_as_string(times, unit = unit or _time_unit(times))
+    return [None if m else s + 'Z' for s, m in zip(strings.tolist(), missing.tolist())]
+
+def _format_column(values, precision):
+    if precision is None:
+        return [str(i) for i in values.tolist()]
+    return [f'{i:.{precision}f}' for i in values.tolist()]
+
+def trkseg_chunks(segment, precision = None, ele_precision = None,
+        chunk_size = CHUNK_SIZE):
+    """
+    Serialized trkseg of segment (a track.Track, or points as
+    track.Track.from_points takes them), as strings of up to chunk_size
+    trkpt each, for XmlStreamWriter.raw.
+
+    The columns are formatted in bulk instead of building an element per
+    point. Every trkpt has lat and lon, then ele and time where the track
+    has them (NaN and NaT are left out), in the order gpx 1.1 wants.
+    precision and ele_precision are the decimals of the coordinates and the
+    elevations; None writes them as str does, as make_trkseg always has.
+    """
+    segment = track.Track.from_points(segment)
+    if len(segment) == 0:
+        yield '<trkseg/>'
+        return
+    yield '<trkseg>'
+    if segment.time is not None:
+        unit = _time_unit(segment.time)
+    for start in range(0, len(segment), chunk_size):
+        end = min(start + chunk_size, len(segment))
+        lats = _format_column(segment.lat[start:end], precision)
+        lons = _format_column(segment.lon[start:end], precision)
+        children = [''] * (end - start)
+        if segment.ele is not None:
+            eles = segment.ele[start:end]
+            children = [c if m else f'{c}<ele>{s}</ele>'
+                    for c, m, s in zip(children, np.isnan(eles).tolist(),
+                        _format_column(eles, ele_precision))]
+        if segment.time is not None:
+            children = [c if t is None else f'{c}<time>{t}</time>'
+                    for c, t in zip(children, format_times(segment.time[start:end], unit = unit))]
+        yield ''.join(
+                f'<trkpt lat="{lat}" lon="{lon}">{c}</trkpt>' if c else
+                f'<trkpt lat="{lat}" lon="{lon}"/>'
+                for lat, lon, c in zip(lats, lons, children))
+    yield '</trkseg>'
+
+def write_trkseg(writer, segment, precision = None, ele_precision = None):
+    """
+    Write segment as a trkseg through xmlstream.XmlStreamWriter writer, see
+    trkseg_chunks.
+    """
+    for chunk in trkseg_chunks(segment, precision = precision,
+            ele_precision = ele_precision):
+        writer.raw(chunk)
+
@@ -1,9 +1,17 @@
 try:
     from lxml import etree
+    # a long line has all its coordinates in one text node, which can be
+    # more than the 10 MB lxml accepts by default
+    ITERPARSE_OPTIONS = {'huge_tree': True}
 except ImportError:
     import xml.etree.ElementTree as etree
+    ITERPARSE_OPTIONS = {}
 
-import tools
+import numpy as np
+
+import track
+
+PLACEMARK = '{http://www.opengis.net/kml/2.2}Placemark'
 
 class KmlError(Exception):
     pass
@@ -11,7 +19,18 @@ class KmlError(Exception):
 def swap_long_lat(points):
     """
     for kml
+
+    A Track or PointsView is read from its lat, lon and ele columns, without
+    making its point tuples (and their datetimes).
     """
+    if isinstance(points, track.PointsView):
+        points = points.track
+    if isinstance(points, track.Track):
+        columns = [points.lon.tolist(), points.lat.tolist()]
+        # as for tuples, only (lat, lon, ele) points keep their elevation
+        if points.ele is not None and points.time is None:
+            columns.append(track.elevations(points.ele))
+        return list(zip(*columns))
     final = []
     for i in points:
         if len(i) == 3:
@@ -34,15 +53,42 @@ def tracks_from_file(path, verbose = False):
 
 
 def tracks_from_kml(path, verbose = False):
-    tree = tools.get_tree(path = path)
-    lines = get_lines(tree= tree)
-    final = []
-    for counter, i in enumerate(lines):
-        name = i['name']
-        d = {'name':name, 'points':i['points']}
-        
-        final.append(d)
-    return final
+    lines, points = read_kml(path = path, verbose = verbose)
+    return lines
+
+def read_kml(path, verbose = False) -> tuple:
+    """
+    Read the lines and the waypoints of a kml file in one pass.
+
+    Returns (lines, points): lines is a list of track.Track, one per
+    LineString, and points a list of {'name', 'points'} dicts as
+    get_points makes. Each Placemark is released as soon as it has been
+    read, so the whole DOM is never held in memory.
+    """
+    lines = []
+    points = []
+    for event, element in etree.iterparse(path, events = ('end',),
+            **ITERPARSE_OPTIONS):
+        if element.tag != PLACEMARK:
+            continue
+        placemark_lines, point = _read_placemark(element)
+        for i in placemark_lines:
+            coordinates = i['coordinates']
+            lines.append(track.Track(
+                name = i['name'],
+                lat = np.ascontiguousarray(coordinates[:, 1]),
+                lon = np.ascontiguousarray(coordinates[:, 0]),
+                ele = np.ascontiguousarray(coordinates[:, 2])))
+        if point is not None:
+            points.append(point)
+        _release(element)
+    return lines, points
+
+def _release(element):
+    element.clear()
+    if hasattr(element, 'getprevious'):
+        while element.getprevious() is not None:
+            del element.getparent()[0]
 
 def make_write_root()-> object:
     root = etree.Element("kml", 
@@ -90,12 +136,41 @@ def make_line(name, points):
     placemark.append(line_string)
     return placemark
 
+def write_line(writer, name, point_chunks):
+    """
+    Stream one line to an xmlstream.XmlStreamWriter, the same markup as
+    make_line, with the coordinates text written one chunk of points at a
+    time so the full point list never has to exist.
+    """
+    writer.start('Placemark')
+    name_e = etree.Element("name")
+    name_e.text = name
+    writer.element(name_e)
+    writer.start('LineString')
+    for tag in ('extrude', 'tessellate'):
+        e = etree.Element(tag)
+        e.text = '1'
+        writer.element(e)
+    writer.start('coordinates')
+    first = True
+    for points in point_chunks:
+        coordinates_string = make_point_strings(swap_long_lat(points))
+        if not coordinates_string:
+            continue
+        if not first:
+            writer.text('\n')
+        writer.text(coordinates_string)
+        first = False
+    writer.end()
+    writer.end()
+    writer.end()
+
 def make_point_strings(points):
     if isinstance(points, str):
         return points
     coordinates_list = []
     for i in points:
-        if len(i) == 3:
+        if len(i) == 3 and i[2] is not None:
             coordinates_list.append(f'{i[0]},{i[1]},{i[2]}')
         else:
             coordinates_list.append(f'{i[0]},{i[1]}')
@@ -107,30 +182,81 @@ def get_lines(tree:object)->list:
     final = []
     l = tree.findall('.//{http://www.opengis.net/kml/2.2}Placemark')
     for i in l:
-        children = list(i)
-        name = None
-        for j in children:
-            if j.tag == '{http://www.opengis.net/kml/2.2}name':
-                name  = j.text
-            elif j.tag == '{http://www.opengis.net/kml/2.2}LineString':
-                for k in list(j):
-                    if k.tag == '{http://www.opengis.net/kml/2.2}coordinates':
-                        points = _get_points_from_line_string(k.text)
-                        if name == None:
-                            assert False
-                        final.append(
-                                {'name':name, 
-                                    'points': points
-                                    })
+        lines, point = _read_placemark(i)
+        for j in lines:
+            final.append({'name':j['name'],
+                'points':_points_from_coordinates(j['coordinates'])})
     return final
 
+def _read_placemark(placemark) -> tuple:
+    """
+    The lines ({'name', 'coordinates'} per LineString, coordinates as
+    parse_coordinates returns them) and the waypoint (None if the placemark
+    holds a LineString or no Point) of one Placemark.
+    """
+    lines = []
+    name = None
+    for j in placemark:
+        if j.tag == '{http://www.opengis.net/kml/2.2}name':
+            name  = j.text
+        elif j.tag == '{http://www.opengis.net/kml/2.2}LineString':
+            for k in j:
+                if k.tag == '{http://www.opengis.net/kml/2.2}coordinates':
+                    coordinates = parse_coordinates(k.text)
+                    if name == None:
+                        assert False
+                    lines.append(
+                            {'name':name, 
+                                'coordinates': coordinates
+                                })
+    if lines or placemark.find('{http://www.opengis.net/kml/2.2}LineString') is not None:
+        return lines, None
+    l_cooridinates =  placemark.findall('{http://www.opengis.net/kml/2.2}Point/{http://www.opengis.net/kml/2.2}coordinates')  
+    if not l_cooridinates:
+        return lines, None
+    l_name =  placemark.findall('{http://www.opengis.net/kml/2.2}name')  
+    cooridinates = get_cooridinates_from_string(
+            s = l_cooridinates[0].text)
+    name = None
+    if l_name:
+        name =l_name[0].text
+    return lines, {'name':name, 'points':cooridinates}
+
 def _get_points_from_line_string(s):
-    final = []
-    for i in s.split('\n'):
-        if i.strip() == '':
-            continue
-        lat, lon, ele =  get_cooridinates_from_string(s= i)
-        final.append((float(lat), float(lon), float(ele)))
+    return _points_from_coordinates(parse_coordinates(s))
+
+def _points_from_coordinates(coordinates):
+    return [(lat, lon, ele) for lon, lat, ele in coordinates.tolist()]
+
+def parse_coordinates(s:str)->np.ndarray:
+    """
+    Parse the text of a coordinates element into an (n, 3) float array of
+    (longitude, latitude, altitude) rows, kml order.
+
+    Tuples may be separated by any whitespace, not only newlines, and
+    altitude is optional (NaN when missing). Well-formed text is converted by
+    one numpy call over all the values.
+    """
+    tuples = s.split() if s else []
+    if not tuples:
+        return np.zeros((0, 3))
+    width = tuples[0].count(',') + 1
+    if width in (2, 3) and s.count(',') == (width - 1) * len(tuples):
+        values = np.array(s.replace(',', ' ').split(), dtype = float)
+        if len(values) == width * len(tuples):
+            values = values.reshape(-1, width)
+            if width == 3:
+                return values
+            final = np.full((len(values), 3), np.nan)
+            final[:, :2] = values
+            return final
+    # tuples of mixed width
+    final = np.full((len(tuples), 3), np.nan)
+    for counter, i in enumerate(tuples):
+        fields = i.split(',')
+        if len(fields) < 2:
+            raise KmlError('not enough fields in coordinates')
+        final[counter, :min(len(fields), 3)] = [float(j) for j in fields[:3]]
     return final
 
 def get_cooridinates_from_string(s:str)->(str, str, str):
@@ -174,19 +300,7 @@ def get_points(tree:object, verbose = False)-> list:
     final = []
     l =  tree.findall('.//{http://www.opengis.net/kml/2.2}Placemark')  
     for i in l:
-        is_linestring = False
-        children = list(i)
-        for j in children:
-            if j.tag == '{http://www.opengis.net/kml/2.2}LineString':
-                is_linestring = True
-        if not is_linestring:
-            l_cooridinates =  i.findall('{http://www.opengis.net/kml/2.2}Point/{http://www.opengis.net/kml/2.2}coordinates')  
-            l_name =  i.findall('{http://www.opengis.net/kml/2.2}name')  
-            cooridinates = get_cooridinates_from_string(
-                    s = l_cooridinates[0].text)
-            name = None
-            if l_name:
-                name =l_name[0].text
-            final.append({'name':name, 'points':cooridinates})
+        lines, point = _read_placemark(i)
+        if point is not None:
+            final.append(point)
     return final
-
@@ -1,20 +1,34 @@
 import os
+import sys
 import argparse
 import pprint
 import math
 #from statistics import median
 
-import kml
-import tools
-import gpx
-import optimize
-
 
 pp = pprint.PrettyPrinter(indent= 4)
 
 
+def _add_parse_options(parser):
+    parser.add_argument("--workers", '-w',  type = int,
+            help="parse the files on this many workers, all cores by default")
+    parser.add_argument("--executor", default = 'process',
+            choices = ['process', 'thread'], help="kind of workers")
+    parser.add_argument("--window", type = int,
+            help="most files parsed ahead at once, twice the workers by default")
+
 def _get_args():
     parser = argparse.ArgumentParser()
+    parser.add_argument("--profile", action ='store_true',
+            help="print wall time, cpu time and peak memory of every stage")
+    parser.add_argument("--profile-dump", metavar = 'PATH',
+            help="also write a cProfile of the run to PATH")
+    parser.add_argument("--cache", metavar = 'DIR',
+            help="keep parsed tracks in DIR and reuse them for unchanged files")
+    parser.add_argument("--cache-mb", type = float,
+            help="size cap of the cache, least recently used removed first")
+    parser.add_argument("--cache-key", choices = ['stat', 'hash'],
+            help="key files by path, mtime and size (default) or by content")
     subparsers = parser.add_subparsers(title='subcommands',
                                    description='valid subcommands',
                                    help='additional help')
@@ -25,6 +39,7 @@ def _get_args():
     parser_combine_files.set_defaults(func=combine_files)
     parser_combine_files.add_argument("paths", nargs='+', help="path of file")
     parser_combine_files.add_argument("--out", '-o',  required = True, help="out-path")
+    _add_parse_options(parser_combine_files)
 
     parser_convert_gpx = subparsers.add_parser('convert-to-gpx', help='convert to gpx')
     parser_convert_gpx.set_defaults(func=convert_to_gpx)
@@ -32,6 +47,10 @@ def _get_args():
     parser_convert_gpx.add_argument("--verbose", '-v',  action ='store_true')  
     parser_convert_gpx.add_argument("--out", "-o", required = False,  
             help="out path of file")
+    parser_convert_gpx.add_argument("--precision", '-p',  type = int,
+            help="decimals of latitudes and longitudes, all by default")
+    parser_convert_gpx.add_argument("--ele-precision", type = int,
+            help="decimals of elevations, all by default")
 
     parser_create_mile_markers = subparsers.add_parser(
             'mile-markers', help='create mile markers')
@@ -42,6 +61,10 @@ def _get_args():
             help="out path of file")
     parser_create_mile_markers.add_argument("--reverse", '-r',  
             action ='store_true', help = 'route is up and back, so double points')  
+    parser_create_mile_markers.add_argument("--interval", '-i',  type = float,
+            default = 1, help = 'distance between markers, in unit')
+    parser_create_mile_markers.add_argument("--unit", '-u',  default = 'mi',
+            choices = ['mi', 'km', 'm'])
 
     parser_prune_by_mark = subparsers.add_parser(
             'prune-by-location', help='prune by location')
@@ -61,6 +84,7 @@ def _get_args():
             help="out path of file")
     parser_mult_files_one_line.add_argument("--verbose", '-v',  action ='store_true')  
     parser_mult_files_one_line.set_defaults(func=mult_lines_to_one)
+    _add_parse_options(parser_mult_files_one_line)
 
     parser_prune_to_top = subparsers.add_parser(
             'prune-to-top', help='prune just the first half of hike')
@@ -78,6 +102,7 @@ def _get_args():
             help="out path of file")
     parser_polygon_from_files.add_argument("--verbose", '-v',  action ='store_true')  
     parser_polygon_from_files.set_defaults(func=polygon_from_files)
+    _add_parse_options(parser_polygon_from_files)
 
     parser_smooth = subparsers.add_parser(
             'smooth', 
@@ -95,6 +120,13 @@ def _get_args():
     optimize.add_argument("path", help="path of file")
     optimize.add_argument("--out", '-o',  required = True,  
             help="out path of file")
+    optimize.add_argument("--mode", '-m',  default = 'rdp',
+            choices = ['rdp', 'visvalingam'],
+            help="simplification algorithm")
+    optimize.add_argument("--target", '-n',  type = int,
+            help="visvalingam: number of points to keep")
+    optimize.add_argument("--area", '-a',  type = float,
+            help="visvalingam: smallest triangle to keep, in square meters")
     optimize.set_defaults(func=optimize_func)
 
     optimize = subparsers.add_parser(
@@ -104,11 +136,69 @@ def _get_args():
     optimize.add_argument("path", help="path of file")
     optimize.add_argument("--out", '-o',  required = True,  
             help="out path of file")
+    optimize.add_argument("--timezone", '-t',  default = 'US/Pacific',
+            help="timezone to write the times in, '' for UTC")
     optimize.set_defaults(func=csv_func)
+
+    parser_binary = subparsers.add_parser(
+            'to-binary',
+            help='convert to the memory-mapped binary track format (.mtb)')
+    parser_binary.add_argument("--verbose", '-v',  action ='store_true')
+    parser_binary.add_argument("path", help="path of file")
+    parser_binary.add_argument("--out", '-o',
+            help="out path of file, path with .mtb by default")
+    parser_binary.set_defaults(func=to_binary)
+
+    parser_batch = subparsers.add_parser(
+            'batch',
+            help='apply one operation to every track file of directories or globs')
+    parser_batch.add_argument("operation",
+            choices = ['convert-to-gpx', 'smooth', 'optimize', 'mile-markers',
+                'csv', 'to-binary'])
+    parser_batch.add_argument("paths", nargs='+',
+            help="files, directories or glob patterns")
+    parser_batch.add_argument("--out-dir", '-o',  required = True,
+            help="directory for the outputs, named after the inputs")
+    parser_batch.add_argument("--workers", '-w',  type = int,
+            help="processes to run, all cores by default")
+    parser_batch.add_argument("--force", '-f',  action ='store_true',
+            help="redo outputs that are newer than their input")
+    parser_batch.add_argument("--verbose", '-v',  action ='store_true')
+    parser_batch.add_argument("--reverse", '-r',  action ='store_true',
+            help="mile-markers: route is up and back")
+    parser_batch.add_argument("--interval", '-i',  type = float, default = 1,
+            help="mile-markers: distance between markers, in unit")
+    parser_batch.add_argument("--unit", '-u',  default = 'mi',
+            choices = ['mi', 'km', 'm'], help="mile-markers: unit of interval")
+    parser_batch.add_argument("--timezone", '-t',  default = 'US/Pacific',
+            help="csv: timezone to write the times in")
+    parser_batch.add_argument("--mode", '-m',  default = 'rdp',
+            choices = ['rdp', 'visvalingam'], help="optimize: algorithm")
+    parser_batch.add_argument("--target", '-n',  type = int,
+            help="optimize: visvalingam number of points to keep")
+    parser_batch.add_argument("--area", '-a',  type = float,
+            help="optimize: visvalingam smallest triangle to keep, in square meters")
+    parser_batch.set_defaults(func=batch_func)
     
 
     args = parser.parse_args()
-    args.func(args)
+    if (getattr(args, 'mode', None) == 'visvalingam'
+            and getattr(args, 'operation', 'optimize') == 'optimize'
+            and args.target is None and args.area is None):
+        parser.error('--mode visvalingam needs --target or --area')
+    # through the environment so that batch workers use the cache too
+    for option, name in ((args.cache, 'MAP_TOOLS_CACHE'),
+            (args.cache_mb, 'MAP_TOOLS_CACHE_MB'),
+            (args.cache_key, 'MAP_TOOLS_CACHE_KEY')):
+        if option is not None:
+            os.environ[name] = str(option)
+    if args.profile or args.profile_dump:
+        import tools
+        with tools.profile(dump = args.profile_dump) as stages:
+            args.func(args)
+        print(tools.format_profile(stages), file = sys.stderr)
+    else:
+        args.func(args)
 
     return args
 
@@ -116,10 +206,14 @@ def main():
     args = _get_args()
 
 def combine_files(args):
+    import tools
     tools.combine_lines_to_one_file(
             paths = args.paths,
             out = args.out,
-            verbose = args.verbose
+            verbose = args.verbose,
+            workers = args.workers,
+            executor = args.executor,
+            window = args.window
             )
 
 def combine(args):
@@ -128,18 +222,25 @@ def combine(args):
     write_to_path(root = root, path = _make_out_path(in_path))
 
 def convert_to_gpx(args):
+    import tools
     tools.convert_to_gpx(path = args.path, 
             verbose = args.verbose,
-            out = args.out)
+            out = args.out,
+            precision = args.precision,
+            ele_precision = args.ele_precision)
 
 def create_mile_markers(args):
+    import tools
     tools.mile_markers(
             path = args.path,
             out = args.out,
             reverse = args.reverse,
-            verbose = args.verbose)
+            verbose = args.verbose,
+            interval = args.interval,
+            unit = args.unit)
 
 def prune_by_location(args):
+    import tools
     tools.location_prune(path = args.path,
             verbose = args.verbose,
             out = args.out,
@@ -148,13 +249,18 @@ def prune_by_location(args):
             )
 
 def mult_lines_to_one(args):
+    import tools
     tools.mult_lines_to_one(
             paths = args.paths,
             out = args.out,
-            verbose = args.verbose
+            verbose = args.verbose,
+            workers = args.workers,
+            executor = args.executor,
+            window = args.window
             )
 
 def prune_to_top(args):
+    import tools
     tools.prune_to_top(
             path = args.path,
             out = args.out,
@@ -162,30 +268,74 @@ def prune_to_top(args):
             )
 
 def polygon_from_files(args):
+    import tools
     tools.polygon_from_files(
             paths = args.paths,
             out = args.out,
-            verbose = args.verbose
+            verbose = args.verbose,
+            workers = args.workers,
+            executor = args.executor,
+            window = args.window
             )
 
 def smooth_func(args):
+    import tools
     tools.smooth_func(
             path = args.path,
             out = args.out,
             verbose = args.verbose)
 
 def optimize_func(args):
+    import tools
     tools.optimize_func(
             path = args.path,
             out = args.out,
-            verbose = args.verbose)
+            verbose = args.verbose,
+            mode = args.mode,
+            target = args.target,
+            area = args.area)
 
 def csv_func(args):
+    import tools
     tools.csv_func(
             path = args.path,
             out = args.out,
+            verbose = args.verbose,
+            timezone = args.timezone)
+
+def to_binary(args):
+    import tools
+    tools.to_binary(
+            path = args.path,
+            out = args.out or os.path.splitext(args.path)[0] + '.mtb',
             verbose = args.verbose)
 
+def batch_func(args):
+    import batch
+    counts = {'done': 0, 'skipped': 0, 'failed': 0}
+    for path, out, status, error in batch.run_batch(
+            operation = args.operation,
+            inputs = args.paths,
+            out_dir = args.out_dir,
+            workers = args.workers,
+            force = args.force,
+            verbose = args.verbose,
+            reverse = args.reverse,
+            interval = args.interval,
+            unit = args.unit,
+            timezone = args.timezone,
+            mode = args.mode,
+            target = args.target,
+            area = args.area):
+        counts[status] += 1
+        if status == 'failed':
+            print(f'failed {path}: {error}', file = sys.stderr)
+        elif args.verbose:
+            print(f'{status} {path} -> {out}')
+    print(f'{counts["done"]} done, {counts["skipped"]} skipped, '
+            f'{counts["failed"]} failed')
+    if counts['failed']:
+        sys.exit(1)
 
 
 if __name__== '__main__':
@@ -0,0 +1,67 @@
+import os
+
+import numpy as np
+
+import spatial
+from track import coordinates
+
+MAX_DISTANCE = 15
+POOL_MIN_POINTS = 10000
+
+def _nearest(args):
+    """
+    Nearest point of one track for every base point. Runs in a worker
+    process, so it takes and returns plain arrays.
+    """
+    lats, lons, base_lats, base_lons = args
+    if len(lats) == 0:
+        n = len(base_lats)
+        return np.zeros(n, dtype = np.int64), np.full(n, np.inf)
+    index = spatial.SpatialIndex(lats, lons)
+    distances, indices = index.query(base_lats, base_lons, k = 1)
+    return indices[:, 0], distances[:, 0]
+
+def _map(jobs, processes, base_size):
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = min(processes, len(jobs))
+    if processes < 2 or base_size < POOL_MIN_POINTS:
+        return [_nearest(i) for i in jobs]
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers = processes) as executor:
+        return list(executor.map(_nearest, jobs))
+
+def merge_tracks(base, others, max_distance = MAX_DISTANCE, processes = None):
+    """
+    Fuse several recordings of the same route onto the points of base.
+
+    For every base point the nearest point of each other track is found
+    with one spatial index per track, queried for all base points at once;
+    those lookups run on a process pool of up to processes workers (all
+    cores by default) when the base track is large enough to pay for it.
+    Matches max_distance meters or further away are dropped.
+
+    As tools.merge_lines always has, each base point gets one output point
+    per other track: the median of the base point and its matches in the
+    first 1, 2, ... other tracks. Returns (lats, lons) arrays of length
+    len(base) * len(others), ordered base point by base point.
+    """
+    base_lats, base_lons = coordinates(base)
+    columns = [coordinates(i) for i in others]
+    jobs = [(lats, lons, base_lats, base_lons) for lats, lons in columns]
+    n = len(base_lats)
+    lat_matrix = np.full((n, len(others) + 1), np.nan)
+    lon_matrix = np.full((n, len(others) + 1), np.nan)
+    lat_matrix[:, 0] = base_lats
+    lon_matrix[:, 0] = base_lons
+    for column, ((lats, lons), (indices, distances)) in enumerate(
+            zip(columns, _map(jobs, processes, n)), 1):
+        near = distances < max_distance
+        lat_matrix[near, column] = lats[indices[near]]
+        lon_matrix[near, column] = lons[indices[near]]
+    merged_lats = np.empty((n, len(others)))
+    merged_lons = np.empty((n, len(others)))
+    for k in range(1, len(others) + 1):
+        merged_lats[:, k - 1] = np.nanmedian(lat_matrix[:, :k + 1], axis = 1)
+        merged_lons[:, k - 1] = np.nanmedian(lon_matrix[:, :k + 1], axis = 1)
+    return merged_lats.ravel(), merged_lons.ravel()
@@ -1,13 +1,93 @@
-import srtm
 import numpy as np
-from rdp import rdp
 
-def optimize_points(points,  epsilon = 0.0001):
-    arr = np.array([[x[0], x[1]] for x in points])
-    mask = rdp(arr, algo="iter", return_mask=True, epsilon=epsilon)
-    parr = np.array(points)
-    final = []
-    for i in list(parr[mask]):
-        final.append(tuple(i.tolist()))
-    return final
+from geo import EARTH_RADIUS
+from track import coordinates
 
+EPSILON = 10
+
+def project(lats, lons) -> tuple:
+    """
+    x, y in meters on an equirectangular projection centered on the middle
+    latitude of the track and the longitude of its first point.
+    """
+    lats = np.asarray(lats, dtype = float)
+    lons = np.asarray(lons, dtype = float)
+    coef = np.cos(np.radians((lats.min() + lats.max()) / 2))
+    x = np.radians((lons - lons[0] + 180) % 360 - 180) * coef * EARTH_RADIUS
+    y = np.radians(lats - lats[0]) * EARTH_RADIUS
+    return x, y
+
+def rdp_mask(x, y, epsilon = EPSILON) -> np.ndarray:
+    """
+    Ramer-Douglas-Peucker on projected coordinates; returns a boolean mask
+    of the points to keep.
+
+    Every dropped point is within epsilon (in the units of x and y) of the
+    segment that replaces it. Instead of recursing range by range, all the
+    ranges at one depth of the split are handled together: the distances of
+    their interior points to their segments are one array expression and
+    each range's farthest point comes from a segmented maximum.
+    """
+    x = np.asarray(x, dtype = float)
+    y = np.asarray(y, dtype = float)
+    n = len(x)
+    keep = np.zeros(n, dtype = bool)
+    if n < 3:
+        keep[:] = True
+        return keep
+    keep[0] = keep[-1] = True
+    begins = np.array([0])
+    ends = np.array([n - 1])
+    while len(begins):
+        counts = ends - begins - 1
+        has_interior = counts > 0
+        begins = begins[has_interior]
+        ends = ends[has_interior]
+        counts = counts[has_interior]
+        if len(begins) == 0:
+            break
+        offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        total = int(counts.sum())
+        indices = np.arange(total) + np.repeat(begins + 1 - offsets, counts)
+
+        dx = np.repeat(x[ends] - x[begins], counts)
+        dy = np.repeat(y[ends] - y[begins], counts)
+        px = x[indices] - np.repeat(x[begins], counts)
+        py = y[indices] - np.repeat(y[begins], counts)
+        length = dx * dx + dy * dy
+        length[length == 0] = 1
+        t = px * dx
+        t += py * dy
+        t /= length
+        np.clip(t, 0, 1, out = t)
+        px -= t * dx
+        py -= t * dy
+        d = px * px
+        d += py * py
+
+        largest = np.maximum.reduceat(d, offsets)
+        split = largest > epsilon * epsilon
+        hits = np.flatnonzero(d == np.repeat(largest, counts))
+        # first point with the largest distance in each range
+        owner = np.searchsorted(offsets, hits, side = 'right') - 1
+        first = np.flatnonzero(np.diff(owner, prepend = -1))
+        positions = indices[hits[first]][split]
+        keep[positions] = True
+        begins, ends = (np.concatenate((begins[split], positions)),
+                np.concatenate((positions, ends[split])))
+    return keep
+
+def optimize_mask(lats, lons, epsilon = EPSILON) -> np.ndarray:
+    """
+    rdp_mask for latitude and longitude columns with epsilon in meters. The
+    mask selects the kept points of the track, e.g. track[mask].
+    """
+    x, y = project(lats, lons)
+    return rdp_mask(x, y, epsilon = epsilon)
+
+def optimize_points(points,  epsilon = EPSILON):
+    if len(points) == 0:
+        return []
+    lats, lons = coordinates(points)
+    mask = optimize_mask(lats, lons, epsilon = epsilon)
+    return [tuple(points[i]) for i in np.flatnonzero(mask)]
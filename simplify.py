@@ -1,67 +1,76 @@
 import math
 
+import numpy as np
+
+import geo
+from track import coordinates
+
 EARTH_RADIUS = 6378.137 * 1000
 ONE_DEGREE = (2*math.pi*EARTH_RADIUS) / 360  # ==> 111.319 km
 def simplify(points: list, max_distance: float = None) -> list:
-    _max_distance = max_distance if max_distance is not None else 10
-
     if len(points) < 3:
         return points
+    lats, lons = coordinates(points)
+    keep = simplify_mask(lats, lons, max_distance = max_distance)
+    return [points[i] for i in np.flatnonzero(keep)]
 
-    begin, end = points[0], points[-1]
-
-    # Use a "normal" line just to detect the most distant point (not its real distance)
-    # this is because this is faster to compute than calling distance_from_line() for
-    # every point.
-    #
-    # This is an approximation and may have some errors near the poles and if
-    # the points are too distant, but it should be good enough for most use
-    # cases...
-    a, b, c = get_line_equation_coefficients(begin, end)
-
-    # Initialize to safe values
-    tmp_max_distance: float = 0
-    tmp_max_distance_position = 1
-    
-    # Check distance of all points between begin and end, exclusive
-    for point_no in range(1,len(points)-1):
-        point = points[point_no]
-        d = abs(a * point[0] + b * point[1] + c)
-        if d > tmp_max_distance:
-            tmp_max_distance = d
-            tmp_max_distance_position = point_no
-
-    # Now that we have the most distance point, compute its real distance:
-    real_max_distance = distance_from_line(points[tmp_max_distance_position], begin, end)
-
-    # If furthest point is less than max_distance, remove all points between begin and end
-    if real_max_distance is not None and real_max_distance < _max_distance:
-        return [begin, end]
-    
-    # If furthest point is more than max_distance, use it as anchor and run
-    # function again using (begin to anchor) and (anchor to end), remove extra anchor
-    return (simplify(points[:tmp_max_distance_position + 1], _max_distance) +
-            simplify(points[tmp_max_distance_position:], _max_distance)[1:])
-
-def get_line_equation_coefficients(location1, location2):
+def simplify_mask(lats, lons, max_distance: float = None) -> np.ndarray:
     """
-    Get line equation coefficients for:
-        latitude * a + longitude * b + c = 0
+    Douglas-Peucker over latitude and longitude columns; returns a boolean
+    mask of the points to keep.
 
-    This is a normal cartesian line (not spherical!)
+    Works on (begin, end) index ranges of the one pair of arrays with an
+    explicit stack, so there is no recursion limit and nothing is copied
+    per level. max_distance is in meters: every dropped point is within it
+    of the segment that replaces it.
     """
-    #long is neg
-    #(47.7112324443, -122.3719442915, -1.53)
-    #so index 1
+    _max_distance = max_distance if max_distance is not None else 10
+    n = len(lats)
+    keep = np.zeros(n, dtype = bool)
+    if n < 3:
+        keep[:] = True
+        return keep
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        begin, end = stack.pop()
+        if end - begin < 2:
+            continue
+        # distance of every point between begin and end, exclusive
+        deviation = deviations(lats[begin:end + 1], lons[begin:end + 1])[1:-1]
+        position = begin + 1 + int(np.argmax(deviation))
+
+        # If furthest point is less than max_distance, remove all points between begin and end
+        if deviation[position - begin - 1] < _max_distance:
+            continue
+
+        # If furthest point is more than max_distance, use it as anchor and
+        # handle (begin to anchor) and (anchor to end) the same way
+        keep[position] = True
+        stack.append((position, end))
+        stack.append((begin, position))
+    return keep
+
+def deviations(lats, lons) -> np.ndarray:
+    """
+    Distance in meters of every point from the segment joining the first
+    and the last point.
 
-    if location1[1] == location2[2]:
-        # Vertical line:
-        return float(0), float(1), float(-1 * location1[1])
-    else:
-        #a = float(location1.latitude - location2.latitude) / (location1.longitude - location2.longitude)
-        a = float(location1[0] - location2[0]) / (location1[1] - location2[1])
-        b = location1[0] - location1[1] * a
-        return float(1), float(-a), float(-b)
+    The points are projected onto a plane tangent at the middle of the
+    range (equirectangular, x east and y north in meters), which is close
+    enough for the lengths a track is simplified over.
+    """
+    lat_0 = (lats[0] + lats[-1]) / 2
+    coef = math.cos(math.radians(lat_0))
+    x = ((lons - lons[0] + 180) % 360 - 180) * coef * ONE_DEGREE
+    y = (lats - lats[0]) * ONE_DEGREE
+    dx = x[-1]
+    dy = y[-1]
+    length = dx * dx + dy * dy
+    if length == 0:
+        return np.hypot(x, y)
+    t = np.clip((x * dx + y * dy) / length, 0, 1)
+    return np.hypot(x - t * dx, y - t * dy)
 
 
 def distance_from_line(point, line_point_1, line_point_2) -> float:
@@ -70,25 +79,22 @@ def distance_from_line(point, line_point_1, line_point_2) -> float:
     assert line_point_1, line_point_1
     assert line_point_2, line_point_2
 
-    #a = line_point_1.distance_2d(line_point_2)
     a = distance_2d(point1 = line_point_1,
             point2 = line_point_2
             )
 
     if not a:
-        return line_point_1.distance_2d(point)
+        return distance_2d(point1 = line_point_1, point2 = point)
 
     b = distance_2d(point1 = line_point_1,
-            point2 = line_point_2
+            point2 = point
             )
-    c = distance_2d(point1 = line_point_1,
-            point2 = line_point_2
+    c = distance_2d(point1 = line_point_2,
+            point2 = point
             )
 
-    if a is not None and b is not None and c is not None:
-        s = (a + b + c) / 2.
-        return 2. * math.sqrt(abs(s * (s - a) * (s - b) * (s - c))) / a
-    return None
+    s = (a + b + c) / 2.
+    return 2. * math.sqrt(abs(s * (s - a) * (s - b) * (s - c))) / a
 
 def distance_2d(point1, point2) -> float:
     #return distance(point[0], point[1], None, location.latitude, location.longitude, None)
@@ -121,7 +127,8 @@ def distance(latitude_1, longitude_1,
 
     # If points too distant -- compute haversine distance:
     if haversine or (abs(latitude_1 - latitude_2) > .2 or abs(longitude_1 - longitude_2) > .2):
-        return haversine_distance(latitude_1, longitude_1, latitude_2, longitude_2)
+        return float(geo.one_to_many(latitude_1, longitude_1,
+            geo.prepare(np.array([latitude_2]), np.array([longitude_2])))[0])
 
     coef = math.cos(math.radians(latitude_1))
     x = latitude_1 - latitude_2
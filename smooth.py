@@ -1,6 +1,9 @@
 import math
 import numpy
 
+import geo
+from track import coordinates
+
 Re = 6371000  # Earth radius in meters
 
 def extract(point) :
@@ -23,50 +26,114 @@ class Keeper:
         pass
 
 
+INTERVAL_CHUNK = 16
+
+def _dist(lat_0, lon_0, lat, lon):
+    """
+    dist() from one point to arrays of points, all in radians.
+    """
+    a = numpy.sin((lat - lat_0) / 2) ** 2 + \
+        numpy.cos(lat_0) * numpy.cos(lat) * numpy.sin((lon - lon_0) / 2) ** 2
+    return Re * 2 * numpy.arctan2(numpy.sqrt(a), numpy.sqrt(1 - a))
+
+def _arc_distances(lat, lon, xyz, begin, end):
+    """
+    greatcircle_point_distance() from every point of begin:end to the arc
+    joining its first and last point, in one pass over the cached radians
+    and cartesian coordinates.
+    """
+    lat_, lon_, xyz_ = lat[begin:end], lon[begin:end], xyz[begin:end]
+    endpoint = numpy.minimum(
+            _dist(lat_[0], lon_[0], lat_, lon_),
+            _dist(lat_[-1], lon_[-1], lat_, lon_))
+    normal = numpy.cross(xyz_[0], xyz_[-1])
+    norm = numpy.linalg.norm(normal)
+    if not norm > 0:
+        # same or antipodal endpoints: there is no single arc to project on
+        return endpoint
+    normal /= norm
+    intersect = xyz_ - numpy.outer(xyz_ @ normal, normal)
+    intersect *= (Re / numpy.linalg.norm(intersect, axis = 1))[:, None]
+    i_lat = numpy.arcsin(intersect[:, 2] / Re)
+    i_lon = numpy.arctan2(intersect[:, 1], intersect[:, 0])
+    d = _dist(lat_, lon_, i_lat, i_lon)
+    d0 = intersect @ xyz_[0]
+    d1 = intersect @ xyz_[-1]
+    c = numpy.einsum('ij,ij->i',
+            numpy.cross(intersect, xyz_[0]), numpy.cross(intersect, xyz_[-1]))
+    between = (c < 0) & ((d0 >= 0) == (d1 >= 0))
+    return numpy.where(between, d, endpoint)
+
+def _interval_indices(lat, lon, begin, end, maxinterval, out):
+    """
+    The points of begin:end more than maxinterval from the last one taken
+    (starting with the first point) and from the last point of the range.
+    The distances are computed a chunk of points at a time.
+    """
+    far_from_end = _dist(lat[end - 1], lon[end - 1],
+            lat[begin:end], lon[begin:end]) > maxinterval
+    prev = begin
+    start = begin
+    chunk = INTERVAL_CHUNK
+    while start < end:
+        stop = min(start + chunk, end)
+        hits = numpy.flatnonzero(
+                (_dist(lat[prev], lon[prev], lat[start:stop], lon[start:stop])
+                    > maxinterval) & far_from_end[start - begin:stop - begin])
+        if len(hits) == 0:
+            start = stop
+            chunk *= 2
+            continue
+        prev = start + int(hits[0])
+        out.append(prev)
+        start = prev + 1
+        chunk = INTERVAL_CHUNK
+
+def process_indices(lats, lons, maxdistance = 5, maxinterval = 10):
+    """
+    The indices of the points process() keeps, in order.
+
+    The points are converted to radians and cartesian coordinates once; each
+    range is then handled with array operations, and ranges are split with
+    an explicit stack instead of recursion.
+    """
+    prepared = geo.prepare(lats, lons)
+    lat, lon = prepared[0], prepared[1]
+    xyz = geo.unit_vectors(prepared) * Re
+    final = []
+    if len(lat) == 0:
+        return numpy.array(final, dtype = numpy.int64)
+    stack = [(0, len(lat))]
+    while stack:
+        begin, end = stack.pop()
+        d = _arc_distances(lat, lon, xyz, begin, end)[1:]
+        if len(d) and d.max() > maxdistance:
+            # Keep this point if it is at least 'maxdistance' from the
+            # connecting arc, and process the two subsegments
+            idx = begin + 1 + int(numpy.argmax(d))
+            stack.append((idx, end))
+            stack.append((begin, idx))
+        elif maxinterval is not None and maxinterval > 0 : #Python 3 fix
+            # Note that this does not satisfy the 'maxinterval' limit,
+            # but instead takes the next point just further than the
+            # given limit.
+            # FIXME might be better to take the previous point, to make
+            # the limit a guaranteed one.
+            _interval_indices(lat, lon, begin, end, maxinterval, final)
+    return numpy.array(final, dtype = numpy.int64)
+
 def process(
-        points, final_points = [], maxdistance = 5, maxinterval = 10, debug = False,
+        points, final_points = None, maxdistance = 5, maxinterval = 10, debug = False,
         verbose =False):
+    if final_points is None:
+        final_points = []
     if debug:
         print('processing')
         print(f'len of data is {len(points)}')
-    bounds = (extract(points[0]), extract(points[-1]))
-    idx,maxd = None,None
-    for counter, i in enumerate(points):
-        if counter == 0:
-            continue
-        current_points_in_radians = extract(i)
-        d = greatcircle_point_distance(bounds, current_points_in_radians)
-        if maxd is None or d > maxd :
-            maxd = d
-            idx = counter
-    if maxd is not None and maxd  > maxdistance :
-        # Keep this point if it is at least 'maxdistance' from the
-        # connecting arc, and run 'process' on the two subsegments
-        process(
-                points = points[:idx],   
-                maxdistance = maxdistance, 
-                maxinterval = maxinterval, 
-                final_points = final_points)
-        process(
-                points = points[idx:],  
-                maxdistance = maxdistance, 
-                maxinterval = maxinterval, 
-                final_points = final_points)
-    elif maxinterval is not None and maxinterval > 0 : #Python 3 fix                            
-        prev = bounds[0]
-        fin = bounds[1]
-        for counter, i in enumerate(points):
-            current_points_in_radians = extract(i)
-            if dist(prev, current_points_in_radians) > maxinterval\
-                and dist(fin, current_points_in_radians) > maxinterval :
-                # Note that this does not satisfy the 'maxinterval' limit,
-                # but instead takes the next point just further than the
-                # given limit.
-                # FIXME might be better to take the previous point, to make
-                # the limit a guaranteed one.
-                #final_points.append(points[counter])
-                final_points.append(i)
-                prev = current_points_in_radians
+    lats, lons = coordinates(points)
+    for i in process_indices(lats, lons,
+            maxdistance = maxdistance, maxinterval = maxinterval):
+        final_points.append(points[i])
     return final_points
 
 
@@ -0,0 +1,276 @@
+import numpy as np
+
+import geo
+
+MAX_CANDIDATES = 1 << 22
+QUERY_BLOCK = 1 << 16
+DEFAULT_CELL_SIZE = 100
+MAX_CELL_POINTS = 16
+
+_OFFSETS = np.array([(i, j, k)
+    for i in (-1, 0, 1) for j in (-1, 0, 1) for k in (-1, 0, 1)],
+    dtype = np.int64)
+
+class SpatialIndexError(Exception):
+    pass
+
+def _chord(distance):
+    """
+    Chord length on the unit sphere for a great circle distance in meters.
+    """
+    return 2 * np.sin(min(distance / geo.EARTH_RADIUS, np.pi) / 2)
+
+def _arc(chord):
+    """
+    Great circle distance in meters for a chord length on the unit sphere.
+    """
+    return 2 * geo.EARTH_RADIUS * np.arcsin(min(chord / 2, 1))
+
+def _expand(starts, counts, order):
+    ends = np.cumsum(counts)
+    positions = np.arange(ends[-1] if len(ends) else 0) - \
+            np.repeat(ends - counts, counts) + np.repeat(starts, counts)
+    return order[positions]
+
+class _Grid:
+    """
+    Points bucketed into cubic cells of one size, stored as the cell keys in
+    sorted order with the start and count of each cell's points.
+    """
+
+    def __init__(self, xyz, size):
+        cells = np.floor(xyz / size).astype(np.int64)
+        self.size = size
+        self.low = cells.min(axis = 0)
+        self.shape = cells.max(axis = 0) - self.low + 1
+        keys = self._keys(cells - self.low)
+        self.order = np.argsort(keys, kind = 'stable')
+        self.keys, self.starts, self.counts = np.unique(
+                keys[self.order], return_index = True, return_counts = True)
+
+    def _keys(self, cells):
+        return (cells[..., 0] * self.shape[1] + cells[..., 1]) * \
+                self.shape[2] + cells[..., 2]
+
+    def neighbours(self, xyz):
+        """
+        (query, start, count) for every non-empty cell in the 3x3x3 block
+        around each query point. query is sorted.
+        """
+        cells = np.floor(xyz / self.size).astype(np.int64) - self.low
+        cells = cells[:, None, :] + _OFFSETS[None, :, :]
+        valid = np.all((cells >= 0) & (cells < self.shape), axis = 2)
+        query = np.nonzero(valid)[0]
+        keys = self._keys(cells[valid])
+        position = np.minimum(
+                np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        found = self.keys[position] == keys
+        position = position[found]
+        return query[found], self.starts[position], self.counts[position]
+
+class SpatialIndex:
+    """
+    Nearest-point and radius queries over a fixed set of points.
+
+    Points are bucketed by their unit-sphere ECEF coordinates into a stack of
+    grids whose cell size doubles from cell_size meters up to the whole
+    sphere; each grid is built the first time a query needs it. A query looks
+    at the 27 cells around it, which are guaranteed to hold every point
+    within one cell size, and moves to the next grid only if that is not far
+    enough. Distances returned are exact haversine distances in meters, and
+    ties go to the lowest point index, the same as a linear scan.
+
+    Every query takes an optional boolean mask over the indexed points;
+    points where it is False are ignored.
+    """
+
+    def __init__(self, latitudes, longitudes, cell_size = None,
+            prepared = None):
+        if prepared is None:
+            prepared = geo.prepare(latitudes, longitudes)
+        self.prepared = prepared
+        self.xyz = geo.unit_vectors(prepared)
+        auto = cell_size is None
+        if auto:
+            cell_size = DEFAULT_CELL_SIZE
+            if len(self) > 1:
+                cell_size = max(
+                        4 * float(np.median(geo.segment_distances(prepared))), 1)
+        if cell_size <= 0:
+            raise SpatialIndexError('cell_size must be positive')
+        self.cell_size = cell_size
+        self._grids = {}
+        self._make_sizes()
+        if auto:
+            # dense or self-overlapping tracks: shrink the cells until they
+            # hold a handful of points each
+            while self.cell_size > 1 and len(self) and \
+                    self._grid(0).counts.mean() > MAX_CELL_POINTS:
+                self.cell_size /= 2
+                self._grids = {}
+                self._make_sizes()
+
+    def _make_sizes(self):
+        self._sizes = []
+        size = self.cell_size / geo.EARTH_RADIUS
+        while size < 2:
+            self._sizes.append(size)
+            size *= 2
+        self._sizes.append(size)
+
+    @classmethod
+    def from_points(cls, points, cell_size = None):
+        """
+        Index a list of (lat, lon, ...) points.
+        """
+        n = len(points)
+        lats = np.fromiter((i[0] for i in points), dtype = float, count = n)
+        lons = np.fromiter((i[1] for i in points), dtype = float, count = n)
+        return cls(lats, lons, cell_size = cell_size)
+
+    def __len__(self):
+        return len(self.prepared[0])
+
+    def _grid(self, level):
+        if level not in self._grids:
+            size = self._sizes[level]
+            grid = _Grid(self.xyz, size)
+            # keep the cell keys inside int64 for indexes that span the globe
+            while np.prod(grid.shape.astype(float)) > 2 ** 62:
+                size *= 2
+                grid = _Grid(self.xyz, size)
+            self._grids[level] = grid
+        return self._grids[level]
+
+    def _candidates(self, grid, queries, xyz, mask):
+        """
+        Yield (query, point) pairs of candidate indexes for the given query
+        ids, in chunks of about MAX_CANDIDATES pairs. query is sorted.
+        """
+        for block in range(0, len(queries), QUERY_BLOCK):
+            block_queries = queries[block:block + QUERY_BLOCK]
+            query, starts, counts = grid.neighbours(xyz[block_queries])
+            totals = np.cumsum(np.bincount(
+                query, weights = counts, minlength = len(block_queries)))
+            bounds = np.searchsorted(totals,
+                    np.arange(MAX_CANDIDATES, totals[-1], MAX_CANDIDATES))
+            bounds = np.unique(np.concatenate(
+                [[0], bounds + 1, [len(block_queries)]]))
+            for first, last in zip(bounds[:-1], bounds[1:]):
+                low, high = np.searchsorted(query, [first, last])
+                point = _expand(starts[low:high], counts[low:high], grid.order)
+                owner = block_queries[
+                        np.repeat(query[low:high], counts[low:high])]
+                if mask is not None:
+                    keep = mask[point]
+                    owner = owner[keep]
+                    point = point[keep]
+                yield owner, point
+
+    def _distances(self, prepared, owner, point):
+        return geo.pairwise(
+                tuple(i[owner] for i in prepared),
+                tuple(i[point] for i in self.prepared))
+
+    def _nearest_one(self, owner, point, d, distances, indices):
+        # owner comes out of _candidates sorted, so each query's candidates
+        # are one run and k=1 needs no sort
+        if len(owner) == 0:
+            return
+        first = np.flatnonzero(np.r_[True, owner[1:] != owner[:-1]])
+        best = np.minimum.reduceat(d, first)
+        counts = np.diff(np.r_[first, len(owner)])
+        tied = np.where(d == np.repeat(best, counts), point, len(self))
+        distances[owner[first], 0] = best
+        indices[owner[first], 0] = np.minimum.reduceat(tied, first)
+
+    def query(self, latitudes, longitudes, k = 1, mask = None) -> tuple:
+        """
+        The k nearest indexed points to each query point.
+
+        Returns (distances, indices), both of shape (len(latitudes), k),
+        sorted by distance. Missing neighbours have distance inf and
+        index -1.
+        """
+        prepared = geo.prepare(np.atleast_1d(latitudes), np.atleast_1d(longitudes))
+        m = len(prepared[0])
+        distances = np.full((m, k), np.inf)
+        indices = np.full((m, k), -1, dtype = np.int64)
+        if len(self) == 0 or m == 0:
+            return distances, indices
+        xyz = geo.unit_vectors(prepared)
+        pending = np.arange(m)
+        for level in range(len(self._sizes)):
+            if len(pending) == 0:
+                break
+            grid = self._grid(level)
+            distances[pending] = np.inf
+            indices[pending] = -1
+            for owner, point in self._candidates(grid, pending, xyz, mask):
+                d = self._distances(prepared, owner, point)
+                if k == 1:
+                    self._nearest_one(owner, point, d, distances, indices)
+                    continue
+                order = np.lexsort((point, d, owner))
+                owner, point, d = owner[order], point[order], d[order]
+                first = np.searchsorted(owner, owner)
+                rank = np.arange(len(owner)) - first
+                keep = rank < k
+                distances[owner[keep], rank[keep]] = d[keep]
+                indices[owner[keep], rank[keep]] = point[keep]
+            if level == len(self._sizes) - 1 or grid.size >= 2:
+                break
+            # every point closer than one cell size was a candidate
+            reach = _arc(grid.size) * (1 - 1e-9)
+            pending = pending[~(distances[pending, k - 1] <= reach)]
+        return distances, indices
+
+    def query_radius(self, latitudes, longitudes, radius, mask = None) -> tuple:
+        """
+        The indexed points within radius meters of each query point.
+
+        Returns (indices, distances): two lists with one array per query
+        point, ordered by point index.
+        """
+        prepared = geo.prepare(np.atleast_1d(latitudes), np.atleast_1d(longitudes))
+        m = len(prepared[0])
+        if len(self) == 0 or m == 0:
+            empty = np.zeros(0, dtype = np.int64)
+            return [empty] * m, [empty.astype(float)] * m
+        chord = _chord(radius) * (1 + 1e-9)
+        level = 0
+        while level < len(self._sizes) - 1 and self._sizes[level] < chord:
+            level += 1
+        grid = self._grid(level)
+        owners, points, ds = [], [], []
+        for owner, point in self._candidates(
+                grid, np.arange(m), geo.unit_vectors(prepared), mask):
+            d = self._distances(prepared, owner, point)
+            keep = d <= radius
+            owners.append(owner[keep])
+            points.append(point[keep])
+            ds.append(d[keep])
+        owner = np.concatenate(owners)
+        point = np.concatenate(points)
+        d = np.concatenate(ds)
+        order = np.argsort(owner * len(self) + point)
+        splits = np.cumsum(np.bincount(owner, minlength = m))[:-1]
+        return np.split(point[order], splits), np.split(d[order], splits)
+
+    def nearest(self, latitude, longitude, mask = None) -> tuple:
+        """
+        (index, distance) of the nearest indexed point, or (None, None).
+        """
+        distances, indices = self.query(latitude, longitude, k = 1, mask = mask)
+        if indices[0, 0] < 0:
+            return (None, None)
+        return int(indices[0, 0]), float(distances[0, 0])
+
+    def within(self, latitude, longitude, radius, mask = None) -> tuple:
+        """
+        (indices, distances) of the indexed points within radius meters of
+        one point, ordered by index.
+        """
+        indices, distances = self.query_radius(
+                latitude, longitude, radius, mask = mask)
+        return indices[0], distances[0]
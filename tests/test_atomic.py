@@ -0,0 +1,29 @@
+import os
+import sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+ONE_UP = os.path.split(CURRENT_DIR)[0]
+sys.path.append(ONE_UP)
+
+import pprint
+pp = pprint.PrettyPrinter(indent = 4)
+
+import shutil
+
+import pytest
+
+import atomic
+
+def test_replacing():
+    directory = os.path.join(CURRENT_DIR, 'test_out', 'atomic')
+    shutil.rmtree(directory, ignore_errors = True)
+    os.makedirs(directory)
+    path = os.path.join(directory, 'out.txt')
+    with atomic.replacing(path, 'w') as write_obj:
+        write_obj.write('first')
+    with pytest.raises(ValueError):
+        with atomic.replacing(path, 'w') as write_obj:
+            write_obj.write('half')
+            raise ValueError('failed')
+    with open(path) as read_obj:
+        assert read_obj.read() == 'first'
+    assert os.listdir(directory) == ['out.txt']
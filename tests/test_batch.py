@@ -0,0 +1,78 @@
+import os
+import sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+ONE_UP = os.path.split(CURRENT_DIR)[0]
+sys.path.append(ONE_UP)
+
+import pprint
+pp = pprint.PrettyPrinter(indent = 4)
+
+import shutil
+
+import batch
+
+DATA = os.path.join(CURRENT_DIR, 'test_data')
+
+def _out_dir(name):
+    directory = os.path.join(CURRENT_DIR, 'test_out', name)
+    shutil.rmtree(directory, ignore_errors = True)
+    return directory
+
+def _statuses(results):
+    return {os.path.basename(path): status for path, out, status, error in results}
+
+def test_batch_smooth_skips_and_fails():
+    out_dir = _out_dir('batch_smooth')
+    inputs = [os.path.join(DATA, '*.gpx'), os.path.join(DATA, 'fourty_eight_st.kml')]
+    first = list(batch.run_batch('smooth', inputs, out_dir, workers = 2))
+    # test1.gpx has two tracks, which smooth refuses
+    assert _statuses(first) == {'fourty_eight_st.kml': 'done',
+            'test1.gpx': 'failed', 'test2.gpx': 'done'}
+    assert sorted(os.listdir(out_dir)) == ['fourty_eight_st.kml', 'test2.kml']
+    second = list(batch.run_batch('smooth', inputs, out_dir, workers = 1))
+    assert _statuses(second) == {'fourty_eight_st.kml': 'skipped',
+            'test1.gpx': 'failed', 'test2.gpx': 'skipped'}
+    forced = list(batch.run_batch('smooth', inputs[:1], out_dir, workers = 1,
+        force = True))
+    assert _statuses(forced)['test2.gpx'] == 'done'
+
+def test_batch_options_and_overwrite():
+    out_dir = _out_dir('batch_csv')
+    results = list(batch.run_batch('csv', [os.path.join(DATA, 'test2.gpx')],
+        out_dir, workers = 1, timezone = '', reverse = True))
+    assert _statuses(results) == {'test2.gpx': 'done'}
+    with open(os.path.join(out_dir, 'test2.csv')) as read_obj:
+        # timezone '' writes the times in UTC
+        assert read_obj.readlines()[1] == '2024-05-29 16:59:03,1304\n'
+    results = list(batch.run_batch('convert-to-gpx', [os.path.join(DATA, 'test2.gpx')],
+        DATA, workers = 1))
+    assert results[0][2:] == ('failed', 'output would overwrite the input')
+
+def test_batch_failure_keeps_previous_output():
+    out_dir = _out_dir('batch_failed')
+    os.makedirs(out_dir)
+    out = os.path.join(out_dir, 'test1.kml')
+    with open(out, 'w') as write_obj:
+        write_obj.write('<kml/>')
+    results = list(batch.run_batch('smooth', [os.path.join(DATA, 'test1.gpx')],
+        out_dir, workers = 1, force = True))
+    assert _statuses(results) == {'test1.gpx': 'failed'}
+    with open(out) as read_obj:
+        assert read_obj.read() == '<kml/>'
+    assert os.listdir(out_dir) == ['test1.kml']
+    # a file that fails without an earlier output leaves none
+    results = list(batch.run_batch('csv', [os.path.join(DATA, 'test1.gpx')],
+        out_dir, workers = 1))
+    assert _statuses(results) == {'test1.gpx': 'failed'}
+    assert os.listdir(out_dir) == ['test1.kml']
+
+def test_batch_same_output_name():
+    out_dir = _out_dir('batch_same_name')
+    in_dir = _out_dir('batch_same_name_in')
+    for name in ('a', 'b'):
+        os.makedirs(os.path.join(in_dir, name))
+        shutil.copy(os.path.join(DATA, 'test2.gpx'), os.path.join(in_dir, name, 'x.gpx'))
+    results = list(batch.run_batch('smooth', [os.path.join(in_dir, '*', 'x.gpx')],
+        out_dir, workers = 1))
+    assert [i[2] for i in results] == ['failed', 'failed']
+    assert not os.path.exists(os.path.join(out_dir, 'x.kml'))
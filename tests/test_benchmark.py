@@ -0,0 +1,57 @@
+import os
+import sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+ONE_UP = os.path.split(CURRENT_DIR)[0]
+sys.path.append(ONE_UP)
+
+import pprint
+pp = pprint.PrettyPrinter(indent = 4)
+
+import json
+
+import benchmark
+import tools
+
+def test_run():
+    directory = os.path.join(CURRENT_DIR, 'test_out', 'benchmark')
+    os.makedirs(directory, exist_ok = True)
+    report = benchmark.run(sizes = [2000], directory = directory,
+            stages = ['parse', 'simplify', 'write'])
+    report = json.loads(json.dumps(report))
+    assert [(i['format'], i['stage']) for i in report['results']] == [
+            ('gpx', 'parse'), ('gpx', 'simplify'), ('gpx', 'write'),
+            ('kml', 'parse'), ('kml', 'simplify'), ('kml', 'write')]
+    for i in report['results']:
+        assert i['points'] == 2000
+        assert i['seconds'] > 0 and i['peak_bytes'] > 0
+
+def test_synthetic_files():
+    directory = os.path.join(CURRENT_DIR, 'test_out', 'benchmark')
+    os.makedirs(directory, exist_ok = True)
+    gpx_track = tools.tracks_from_file(benchmark.make_file(500, 'gpx', directory, seed = 3))[0]
+    kml_track = tools.tracks_from_file(benchmark.make_file(500, 'kml', directory, seed = 3))[0]
+    assert len(gpx_track) == len(kml_track) == 500
+    assert (gpx_track.lat == kml_track.lat).all()
+    assert (gpx_track.ele == kml_track.ele).all()
+    assert gpx_track.time[1] - gpx_track.time[0] == 1000
+
+def test_merge_recordings_only_for_merge(monkeypatch):
+    directory = os.path.join(CURRENT_DIR, 'test_out', 'benchmark')
+    os.makedirs(directory, exist_ok = True)
+    path = benchmark.make_file(500, 'gpx', directory)
+    calls = []
+    record = benchmark.record
+    monkeypatch.setattr(benchmark, 'record',
+            lambda *args, **kwargs: calls.append(1) or record(*args, **kwargs))
+    stages = benchmark._stages(path, 500, 0, stages = ['parse', 'write'])
+    assert [i[0] for i in stages] == ['parse', 'write']
+    assert calls == []
+    benchmark._stages(path, 500, 0, stages = ['merge'])
+    assert len(calls) == 2
+
+def test_write_gpx_escapes_the_name():
+    path = os.path.join(CURRENT_DIR, 'test_out', 'benchmark_name.gpx')
+    track = benchmark.record(benchmark.make_route(10))
+    track.name = 'up & <back>'
+    benchmark.write_gpx(track, path)
+    assert tools.tracks_from_file(path)[0].name == 'up & <back>'
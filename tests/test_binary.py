@@ -0,0 +1,55 @@
+import os
+import sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+ONE_UP = os.path.split(CURRENT_DIR)[0]
+sys.path.append(ONE_UP)
+
+import pprint
+pp = pprint.PrettyPrinter(indent = 4)
+
+import numpy as np
+import pytest
+
+import binary
+import tools
+
+DATA = os.path.join(CURRENT_DIR, 'test_data')
+
+def _out(name):
+    directory = os.path.join(CURRENT_DIR, 'test_out')
+    os.makedirs(directory, exist_ok = True)
+    return os.path.join(directory, name)
+
+def test_round_trip():
+    for name in ('test1.gpx', 'test2.gpx', 'mult_lines_points.kml',
+            'fourty_eight_st.kml'):
+        out = _out(os.path.splitext(name)[0] + '.mtb')
+        tools.to_binary(path = os.path.join(DATA, name), out = out)
+        parsed = tools.tracks_from_file(os.path.join(DATA, name))
+        mapped = tools.tracks_from_file(out)
+        assert [i.name for i in mapped] == [i.name for i in parsed]
+        for i, j in zip(parsed, mapped):
+            assert list(i['points']) == list(j['points'])
+            assert list(i.segments) == list(j.segments)
+            assert (i.ele is None) == (j.ele is None)
+            assert (i.time is None) == (j.time is None)
+
+def test_columns_are_mapped():
+    out = _out('test2.mtb')
+    tools.to_binary(path = os.path.join(DATA, 'test2.gpx'), out = out)
+    track = tools.tracks_from_file(out)[0]
+    for column in (track.lat, track.lon, track.ele, track.time):
+        assert isinstance(column.base, np.memmap)
+    assert not track.lat.flags.writeable
+
+def test_smooth_from_binary():
+    out = _out('test2.mtb')
+    tools.to_binary(path = os.path.join(DATA, 'test2.gpx'), out = out)
+    tools.smooth_func(path = out, out = _out('smooth_binary.kml'))
+    tools.smooth_func(path = os.path.join(DATA, 'test2.gpx'), out = _out('smooth_gpx.kml'))
+    with open(_out('smooth_binary.kml'), 'rb') as a, open(_out('smooth_gpx.kml'), 'rb') as b:
+        assert a.read() == b.read()
+
+def test_not_binary():
+    with pytest.raises(binary.BinaryTrackError):
+        binary.read_tracks(os.path.join(DATA, 'test2.gpx'))
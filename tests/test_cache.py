@@ -0,0 +1,88 @@
+import os
+import sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+ONE_UP = os.path.split(CURRENT_DIR)[0]
+sys.path.append(ONE_UP)
+
+import pprint
+pp = pprint.PrettyPrinter(indent = 4)
+
+import shutil
+import time
+
+import cache
+import gpx
+import kml
+import tools
+
+DATA = os.path.join(CURRENT_DIR, 'test_data')
+
+def _dir(name):
+    directory = os.path.join(CURRENT_DIR, 'test_out', name)
+    shutil.rmtree(directory, ignore_errors = True)
+    return directory
+
+def _same(a, b):
+    assert [i.name for i in a] == [i.name for i in b]
+    for i, j in zip(a, b):
+        assert list(i['points']) == list(j['points'])
+        assert list(i.segments) == list(j.segments)
+
+def test_hit_does_not_parse(monkeypatch):
+    monkeypatch.setenv(cache.ENV_DIRECTORY, _dir('cache_hit'))
+    for name in ('test1.gpx', 'test2.gpx', 'mult_lines_points.kml'):
+        path = os.path.join(DATA, name)
+        parsed = tools.tracks_from_file(path)
+        with monkeypatch.context() as m:
+            m.setattr(gpx, 'tracks_from_gpx', None)
+            m.setattr(kml, 'tracks_from_kml', None)
+            cached = tools.tracks_from_file(path)
+        _same(parsed, cached)
+
+def test_stat_key_follows_changes():
+    directory = _dir('cache_stat')
+    path = os.path.join(directory, 'track.gpx')
+    parse_cache = cache.ParseCache(os.path.join(directory, 'entries'))
+    shutil.copy(os.path.join(DATA, 'test2.gpx'), path)
+    parse_cache.put(path, tools.tracks_from_file(path))
+    assert parse_cache.get(path) is not None
+    os.utime(path, ns = (0, 0))
+    assert parse_cache.get(path) is None
+    hashed = cache.ParseCache(os.path.join(directory, 'entries'), key = 'hash')
+    hashed.put(path, tools.tracks_from_file(path))
+    os.utime(path)
+    assert hashed.get(path) is not None
+
+def test_evicts_least_recently_used():
+    directory = _dir('cache_lru')
+    parse_cache = cache.ParseCache(directory)
+    paths = [os.path.join(DATA, i) for i in
+            ('test1.gpx', 'test2.gpx', 'fourty_eight_st.kml')]
+    for path in paths:
+        parse_cache.put(path, tools.tracks_from_file(path))
+        time.sleep(0.01)
+    assert parse_cache.get(paths[0]) is not None
+    sizes = {i[0]: i[1] for i in parse_cache.entries()}
+    parse_cache.max_bytes = sum(sizes.values()) - 1
+    parse_cache.evict()
+    # test2 was the least recently used once test1 was read again
+    assert parse_cache.get(paths[1]) is None
+    assert parse_cache.get(paths[0]) is not None
+    assert parse_cache.get(paths[2]) is not None
+
+def test_corrupt_entry_is_parsed_again(monkeypatch):
+    directory = _dir('cache_corrupt')
+    monkeypatch.setenv(cache.ENV_DIRECTORY, directory)
+    path = os.path.join(DATA, 'test2.gpx')
+    parsed = tools.tracks_from_file(path)
+    entry = cache.from_environment().entries()[0][0]
+    with open(entry, 'r+b') as write_obj:
+        write_obj.truncate(os.path.getsize(entry) // 2)
+    calls = []
+    tracks_from_gpx = gpx.tracks_from_gpx
+    monkeypatch.setattr(gpx, 'tracks_from_gpx',
+            lambda **kwargs: calls.append(1) or tracks_from_gpx(**kwargs))
+    _same(parsed, tools.tracks_from_file(path))
+    assert calls == [1]
+    _same(parsed, tools.tracks_from_file(path))
+    assert calls == [1]
@@ -22,3 +22,18 @@ def test_cluster():
             )
     root = kml.make_write_root()
     folder =etree.Element("Folder") 
+
+def test_cluster_it_partitions_points():
+    tracks = tools.tracks_from_file(path = 'tests/test_data/test2.gpx')
+    points = list(tracks[0]['points'])
+    clusters, remaining, current = tools.cluster_it(
+            points = points,
+            cluster_distance = 20,
+            max_iterations = 30)
+    assert len(clusters) == 30
+    clustered = [j for i in clusters for j in i]
+    assert len(clustered) + len(remaining) == len(points)
+    assert set(clustered).isdisjoint(remaining)
+    assert current in points
+    meds = tools.med_of_clusters(clusters)
+    assert len(meds) == len(clusters)
@@ -0,0 +1,49 @@
+import os
+import sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+ONE_UP = os.path.split(CURRENT_DIR)[0]
+sys.path.append(ONE_UP)
+
+import pprint
+pp = pprint.PrettyPrinter(indent = 4)
+
+import numpy as np
+
+import geo
+import tools
+
+LATS = [47.65846, 47.65859, 47.6586, 47.6586, 47.65867, 47.58124]
+LONS = [-122.40767, -122.4075, -122.40749, -122.40748, -122.40745, -122.39294]
+
+def _scalar(i, j):
+    return tools.haversine_distance(
+            latitude_1 = LATS[i],
+            longitude_1 = LONS[i],
+            latitude_2 = LATS[j],
+            longitude_2 = LONS[j])
+
+def test_segment_distances():
+    d = geo.segment_distances(geo.prepare(LATS, LONS))
+    assert len(d) == len(LATS) - 1
+    for i in range(len(d)):
+        assert abs(d[i] - _scalar(i, i + 1)) < 1e-6
+
+def test_one_to_many():
+    d = geo.one_to_many(LATS[0], LONS[0], geo.prepare(LATS, LONS))
+    for i in range(len(LATS)):
+        assert abs(d[i] - _scalar(0, i)) < 1e-6
+
+def test_many_to_many_blocks():
+    prepared = geo.prepare(LATS, LONS)
+    matrix = geo.many_to_many(prepared, prepared, block_size = 4)
+    assert matrix.shape == (len(LATS), len(LATS))
+    for i in range(len(LATS)):
+        for j in range(len(LATS)):
+            assert abs(matrix[i, j] - _scalar(i, j)) < 1e-6
+
+def test_nearest():
+    prepared = geo.prepare(LATS, LONS)
+    other = geo.prepare(LATS[::-1], LONS[::-1])
+    indices, distances = geo.nearest(prepared, other, block_size = 2)
+    assert list(indices) == [5, 4, 3, 2, 1, 0]
+    assert np.allclose(distances, 0)
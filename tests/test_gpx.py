@@ -0,0 +1,139 @@
+import os
+import sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+ONE_UP = os.path.split(CURRENT_DIR)[0]
+sys.path.append(ONE_UP)
+
+import pprint
+pp = pprint.PrettyPrinter(indent = 4)
+
+import numpy as np
+
+import gpx
+
+def test_iter_segments():
+    path = os.path.join(CURRENT_DIR, 'test_data', 'test1.gpx')
+    segments = list(gpx.iter_segments(path))
+    tracks = gpx.tracks_from_gpx(path)
+    assert [i[0] for i in segments][:2] == [0, 0]
+    assert segments[0][1].name == 'Barrett Spur 1'
+    first = [i[1] for i in segments if i[0] == 0]
+    assert sum(len(i) for i in first) == len(tracks[0])
+    assert np.array_equal(
+            np.concatenate([i.lat for i in first]), tracks[0].lat)
+
+def test_parse_times():
+    times = gpx.parse_times([
+        '2024-05-29T16:59:03Z',
+        '2024-05-29T16:59:03.250Z',
+        '2024-05-29T09:59:03-07:00',
+        '2024-05-29T22:29:03+0530',
+        None])
+    assert times.dtype == np.dtype('datetime64[ms]')
+    assert times[0] == np.datetime64('2024-05-29T16:59:03')
+    assert times[1] == np.datetime64('2024-05-29T16:59:03.250')
+    assert times[2] == times[0]
+    assert times[3] == times[0]
+    assert np.isnat(times[4])
+
+def test_iter_gpx_waypoints():
+    path = os.path.join(CURRENT_DIR, 'test_data', 'test1.gpx')
+    items = list(gpx.iter_gpx(path))
+    waypoints = [i[2] for i in items if i[0] == 'waypoint']
+    assert [i[0] for i in items[:4]] == ['waypoint'] * 4
+    assert waypoints[0] == {'name': 'Vista Ridge Trailhead',
+            'points': (45.44283, -121.72904, 1374.0)}
+    assert len(gpx.tracks_from_gpx(path)) == 2
+
+def test_convert_to_gpx_one_pass():
+    import tools
+    path = os.path.join(CURRENT_DIR, 'test_data', 'test1.gpx')
+    out = os.path.join(CURRENT_DIR, 'test_out', 'convert_test1.gpx')
+    tools.convert_to_gpx(path = path, out = out)
+    items = list(gpx.iter_gpx(out))
+    original = list(gpx.iter_gpx(path))
+    assert [i[0] for i in items] == [i[0] for i in original]
+    assert [i[2] for i in items if i[0] == 'waypoint'] == \
+            [i[2] for i in original if i[0] == 'waypoint']
+    for new, old in zip(items, original):
+        if new[0] == 'segment':
+            assert np.array_equal(new[2].lat, old[2].lat)
+            assert new[2].name == old[2].name
+
+def test_trkseg_chunks():
+    import track
+    segment = track.Track(name = 'x',
+            lat = [45.1, 45.123456789, 45.2],
+            lon = [-121.5, -121.25, -121.0],
+            ele = [0.0, np.nan, 12.345],
+            time = np.array(['2024-05-29T16:59:03', 'NaT', '2024-05-29T16:59:04.500'],
+                dtype = track.TIME_DTYPE))
+    s = ''.join(gpx.trkseg_chunks(segment, chunk_size = 2))
+    assert s == ('<trkseg>'
+            '<trkpt lat="45.1" lon="-121.5"><ele>0.0</ele>'
+            '<time>2024-05-29T16:59:03.000Z</time></trkpt>'
+            '<trkpt lat="45.123456789" lon="-121.25"/>'
+            '<trkpt lat="45.2" lon="-121.0"><ele>12.345</ele>'
+            '<time>2024-05-29T16:59:04.500Z</time></trkpt>'
+            '</trkseg>')
+    s = ''.join(gpx.trkseg_chunks(segment[:2], precision = 3, ele_precision = 0))
+    assert '<trkpt lat="45.123" lon="-121.250"/>' in s
+    assert '<ele>0</ele><time>2024-05-29T16:59:03Z</time>' in s
+    assert list(gpx.trkseg_chunks(segment[:0])) == ['<trkseg/>']
+
+def test_trkseg_matches_make_trkseg():
+    path = os.path.join(CURRENT_DIR, 'test_data', 'test2.gpx')
+    segment = gpx.tracks_from_gpx(path)[0]
+    old = gpx.etree.tostring(gpx.make_trkseg(segment.points)).decode()
+    assert ''.join(gpx.trkseg_chunks(segment)) == old
+    assert '<time>2024-05-29T16:59:03Z</time>' in old
+    trkpt = gpx.etree.tostring(gpx.make_trkpt(45.0, -121.0, 0)).decode()
+    assert trkpt == '<trkpt lat="45.0" lon="-121.0"><ele>0</ele></trkpt>'
+
+def test_convert_to_gpx_binary_and_cache(monkeypatch):
+    import shutil
+    import binary
+    import cache
+    import tools
+    path = os.path.join(CURRENT_DIR, 'test_data', 'test1.gpx')
+    out_dir = os.path.join(CURRENT_DIR, 'test_out', 'convert_cache')
+    shutil.rmtree(out_dir, ignore_errors = True)
+    os.makedirs(out_dir)
+    tools.convert_to_gpx(path = path, out = os.path.join(out_dir, 'plain.gpx'))
+    monkeypatch.setenv(cache.ENV_DIRECTORY, os.path.join(out_dir, 'cache'))
+    for name in ('miss.gpx', 'hit.gpx'):
+        tools.convert_to_gpx(path = path, out = os.path.join(out_dir, name))
+    assert len(cache.from_environment().entries()) == 1
+    outputs = []
+    for name in ('plain.gpx', 'miss.gpx', 'hit.gpx'):
+        with open(os.path.join(out_dir, name), 'rb') as read_obj:
+            outputs.append(read_obj.read())
+    assert outputs[0] == outputs[1] == outputs[2]
+    mtb = os.path.join(out_dir, 'test1.mtb')
+    binary.write_tracks(mtb, gpx.tracks_from_gpx(path))
+    tools.convert_to_gpx(path = mtb, out = os.path.join(out_dir, 'mtb.gpx'))
+    tracks = gpx.tracks_from_gpx(os.path.join(out_dir, 'mtb.gpx'))
+    assert [len(i) for i in tracks] == [len(i) for i in gpx.tracks_from_gpx(path)]
+
+def test_missing_elevation_is_not_written():
+    import tools
+    src = os.path.join(CURRENT_DIR, 'test_out', 'no_ele.gpx')
+    with open(src, 'w') as write_obj:
+        write_obj.write('<gpx xmlns="http://www.topografix.com/GPX/1/1">'
+                '<wpt lat="45.0" lon="-121.0"><ele>0</ele><name>w</name></wpt>'
+                '<trk><trkseg><trkpt lat="45.1" lon="-121.1"/>'
+                '<trkpt lat="45.2" lon="-121.2"><ele>0</ele></trkpt></trkseg></trk></gpx>')
+    segment = gpx.tracks_from_gpx(src)[0]
+    assert np.isnan(segment.ele[0])
+    assert list(segment.points)[0][2] is None
+    out = os.path.join(CURRENT_DIR, 'test_out', 'no_ele_out.gpx')
+    tools.convert_to_gpx(path = src, out = out)
+    with open(out) as read_obj:
+        s = read_obj.read()
+    assert '<wpt lat="45.0" lon="-121.0"><ele>0.0</ele>' in s
+    assert '<trkpt lat="45.1" lon="-121.1"/>' in s
+    assert '<trkpt lat="45.2" lon="-121.2"><ele>0.0</ele></trkpt>' in s
+    csv_out = os.path.join(CURRENT_DIR, 'test_out', 'no_ele.csv')
+    tools.csv_func(path = src, out = csv_out)
+    with open(csv_out) as read_obj:
+        assert read_obj.read().splitlines()[1:] == [',', ',0']
@@ -0,0 +1,32 @@
+import os
+import sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+ONE_UP = os.path.split(CURRENT_DIR)[0]
+sys.path.append(ONE_UP)
+
+import pprint
+pp = pprint.PrettyPrinter(indent = 4)
+
+import subprocess
+
+def _loaded(code, modules):
+    """
+    Which of modules are in sys.modules after running code in a fresh
+    interpreter.
+    """
+    code += f'\nimport sys\nprint(" ".join(i for i in {modules!r} if i in sys.modules))'
+    result = subprocess.run([sys.executable, '-c', code], cwd = ONE_UP,
+            capture_output = True, text = True, check = True)
+    return result.stdout.split()
+
+def test_map_tools_loads_nothing_heavy():
+    assert _loaded('import map_tools', ['tools', 'numpy', 'lxml', 'pytz']) == []
+
+def test_tools_loads_subcommand_modules_on_use():
+    heavy = ['smooth', 'optimize', 'visvalingam', 'merge', 'clustering',
+            'spatial', 'xmlstream', 'pytz', 'srtm', 'rdp', 'csv',
+            'concurrent.futures']
+    assert _loaded('import tools', heavy) == []
+    assert _loaded('import tools\ntools.csv_func('
+            f'path = {os.path.join(CURRENT_DIR, "test_data", "test2.gpx")!r}, '
+            f'out = {os.devnull!r})', heavy) == ['pytz', 'csv']
@@ -0,0 +1,41 @@
+import os
+import sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+ONE_UP = os.path.split(CURRENT_DIR)[0]
+sys.path.append(ONE_UP)
+
+import pprint
+pp = pprint.PrettyPrinter(indent = 4)
+
+import numpy as np
+
+import kml
+import tools
+
+def test_read_kml():
+    path = os.path.join(CURRENT_DIR, 'test_data', 'mult_lines_points.kml')
+    lines, points = kml.read_kml(path)
+    tree = tools.get_tree(path)
+    assert points == kml.get_points(tree)
+    assert points[0]['name'] == 'wp1'
+    expected = kml.get_lines(tree)
+    assert [i.name for i in lines] == [i['name'] for i in expected]
+    for line, i in zip(lines, expected):
+        assert list(line['points']) == i['points']
+
+def test_parse_coordinates():
+    c = kml.parse_coordinates('-122.1,47.5,10 -122.2,47.6,11\n\t-122.3,47.7,12\n')
+    assert c.shape == (3, 3)
+    assert list(c[2]) == [-122.3, 47.7, 12]
+    c = kml.parse_coordinates('-122.1,47.5 -122.2,47.6,4')
+    assert c[1].tolist() == [-122.2, 47.6, 4]
+    assert c[0, :2].tolist() == [-122.1, 47.5] and np.isnan(c[0, 2])
+    assert np.isnan(kml.parse_coordinates('-122.1,47.5 -122.2,47.6')[:, 2]).all()
+    assert kml.parse_coordinates(' \n').shape == (0, 3)
+
+def test_make_line_from_columns():
+    path = os.path.join(CURRENT_DIR, 'test_data', 'test2.gpx')
+    track_ = tools.tracks_from_file(path)[0]
+    for points in (track_.points, track_[:50].points):
+        assert kml.etree.tostring(kml.make_line('x', points)) == \
+                kml.etree.tostring(kml.make_line('x', list(points)))
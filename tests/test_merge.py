@@ -0,0 +1,42 @@
+import os
+import sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+ONE_UP = os.path.split(CURRENT_DIR)[0]
+sys.path.append(ONE_UP)
+
+import pprint
+pp = pprint.PrettyPrinter(indent = 4)
+
+from statistics import median
+
+import numpy as np
+
+import tools
+
+def _recording(n, seed):
+    rng = np.random.default_rng(seed)
+    lats = 47.44 + np.linspace(0, 0.01, n) + rng.normal(0, 5e-5, n)
+    lons = -121.67 + np.linspace(0, 0.01, n) + rng.normal(0, 5e-5, n)
+    return [(lat, lon, 0.0) for lat, lon in zip(lats, lons)]
+
+def _merge_by_scan(tracks):
+    final = []
+    base = tracks[0][0]['points']
+    for p in base:
+        temp_ = [p]
+        for i in tracks[1:]:
+            points = i[0]['points']
+            d = [tools.haversine_distance(p[0], p[1], j[0], j[1]) for j in points]
+            index = d.index(min(d))
+            if d[index] < 15:
+                temp_.append(points[index])
+            final.append((median([j[0] for j in temp_]),
+                median([j[1] for j in temp_]), 0))
+    return final
+
+def test_merge_lines():
+    tracks = [[{'name': f'track_{i}', 'points': _recording(200 + 10 * i, i)}]
+            for i in range(4)]
+    merged = tools.merge_lines(tracks)
+    assert len(merged) == 200 * 3
+    assert merged == _merge_by_scan(tracks)
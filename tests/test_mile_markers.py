@@ -0,0 +1,87 @@
+import os
+import sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+ONE_UP = os.path.split(CURRENT_DIR)[0]
+sys.path.append(ONE_UP)
+
+import pprint
+pp = pprint.PrettyPrinter(indent = 4)
+
+import pytest
+
+import geo
+import tools
+from walk import walk_track
+
+def _walk(n, seed = 0):
+    return walk_track(n, seed = seed, step = 3e-4)
+
+def _brute(track, step):
+    # walk the points one by one, stopping at every boundary crossed
+    final = []
+    walked = 0
+    boundary = step
+    lengths = geo.segment_distances(geo.prepare(track.lat, track.lon))
+    for i in range(len(track) - 1):
+        length = lengths[i]
+        while length > 0 and walked + length >= boundary:
+            fraction = (boundary - walked) / length
+            final.append((
+                track.lat[i] + (track.lat[i + 1] - track.lat[i]) * fraction,
+                track.lon[i] + (track.lon[i + 1] - track.lon[i]) * fraction,
+                track.ele[i] + (track.ele[i + 1] - track.ele[i]) * fraction))
+            boundary += step
+        walked += length
+    return final
+
+def test_matches_brute_force():
+    track = _walk(2000)
+    miles = tools.create_mile_markers(track, precision = None,
+            ele_precision = None)
+    expected = _brute(track, tools.MILE)
+    assert [i['mile'] for i in miles] == list(range(1, len(expected) + 1))
+    for mile, (lat, lon, ele) in zip(miles, expected):
+        assert mile['latitude'] == pytest.approx(lat, abs = 1e-9)
+        assert mile['longitude'] == pytest.approx(lon, abs = 1e-9)
+        assert mile['elevation'] == pytest.approx(ele, abs = 1e-6)
+
+def test_rounded():
+    track = _walk(2000)
+    exact = tools.create_mile_markers(track, precision = None,
+            ele_precision = None)
+    miles = tools.create_mile_markers(track)
+    for mile, full in zip(miles, exact):
+        assert mile['latitude'] == pytest.approx(round(full['latitude'], 6), abs = 1e-12)
+        assert mile['longitude'] == pytest.approx(round(full['longitude'], 6), abs = 1e-12)
+        assert mile['elevation'] == pytest.approx(round(full['elevation'], 1), abs = 1e-12)
+
+def test_markers_are_on_the_boundary():
+    track = _walk(500, seed = 1)
+    miles = tools.create_mile_markers(track, interval = 0.5, unit = 'km')
+    assert miles[0]['mile'] == 0.5
+    assert miles[1]['mile'] == 1
+    assert [i['distance'] for i in miles[:3]] == [500.0, 1000.0, 1500.0]
+
+def test_reverse_comes_back():
+    track = _walk(500, seed = 2)
+    length = track.cumulative_distance[-1]
+    miles = tools.create_mile_markers(track, reverse = True, unit = 'km')
+    assert len(miles) == int(2 * length / 1000)
+    by_distance = {i['distance']: i for i in miles}
+    # going out past d meters and coming back to 2 * length - d meet
+    for i in miles:
+        other = by_distance.get(2 * length - i['distance'])
+        if other is not None:
+            assert other['latitude'] == pytest.approx(i['latitude'])
+
+def test_points_and_no_elevation():
+    track = _walk(300, seed = 3)
+    points = list(zip(track.lat.tolist(), track.lon.tolist()))
+    miles = tools.create_mile_markers(points, unit = 'm', interval = 100)
+    assert miles
+    assert all(i['elevation'] is None for i in miles)
+    assert tools.create_mile_markers(points[:1]) == []
+
+def test_bad_unit():
+    with pytest.raises(tools.ToolsError):
+        tools.create_mile_markers(_walk(10), unit = 'ft')
@@ -12,6 +12,9 @@ import kml
 import gpx
 import tools
 import optimize as  optimize
+import simplify
+
+import numpy as np
 
 POINTS = [   (47.4415674247, -121.6712067928),
     (47.4415685143, -121.6712049488),
@@ -640,3 +643,21 @@ def test_optimize():
     _write(root = root, 
             path = 'optimize1.kml',
             )
+
+def test_optimize_mask_bound():
+    lats, lons = tools.coordinates(POINTS)
+    for epsilon in (1, 10):
+        mask = optimize.optimize_mask(lats, lons, epsilon = epsilon)
+        assert mask[0] and mask[-1]
+        kept = np.flatnonzero(mask)
+        for begin, end in zip(kept[:-1], kept[1:]):
+            for i in range(begin + 1, end):
+                assert simplify.distance_from_line(POINTS[i], POINTS[begin],
+                        POINTS[end]) < epsilon * 1.01
+    assert optimize.optimize_points(points = POINTS, epsilon = 10) == [
+            POINTS[i] for i in np.flatnonzero(optimize.optimize_mask(lats, lons))]
+
+def test_optimize_mask_track():
+    track = tools.tracks_from_file(os.path.join(CURRENT_DIR, 'test_data', 'test2.gpx'))[0]
+    mask = optimize.optimize_mask(track.lat, track.lon)
+    assert len(track[mask]) == mask.sum()
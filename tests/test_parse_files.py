@@ -0,0 +1,55 @@
+import os
+import sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+ONE_UP = os.path.split(CURRENT_DIR)[0]
+sys.path.append(ONE_UP)
+
+import pprint
+pp = pprint.PrettyPrinter(indent = 4)
+
+import pytest
+
+import tools
+
+DATA = os.path.join(CURRENT_DIR, 'test_data')
+PATHS = [os.path.join(DATA, i) for i in
+        ['test2.gpx', 'fourty_eight_st.kml', 'test1.gpx', 'mult_lines1.kml',
+            'test2.gpx', 'mult_lines_points.kml']]
+
+def _out(name):
+    return os.path.join(CURRENT_DIR, 'test_out', name)
+
+def _names(results):
+    return [[(i.name, len(i)) for i in tracks] for tracks in results]
+
+def test_order_matches_sequential():
+    expected = _names(tools.parse_files(PATHS, workers = 1))
+    assert len(expected) == len(PATHS)
+    for executor in tools.EXECUTORS:
+        assert _names(tools.parse_files(PATHS, workers = 3,
+            executor = executor, window = 2)) == expected
+
+def test_window_bounds_files_in_flight(monkeypatch):
+    started = []
+    monkeypatch.setattr(tools, '_parse_one', lambda path: started.append(path) or path)
+    used = 0
+    for path in tools.parse_files(PATHS * 4, workers = 2, executor = 'thread',
+            window = 3):
+        used += 1
+        assert len(started) - used <= 3
+    assert used == len(PATHS) * 4
+
+def test_bad_executor():
+    with pytest.raises(tools.ToolsError):
+        list(tools.parse_files(PATHS, workers = 2, executor = 'fork'))
+
+def test_outputs_match_sequential():
+    for func in (tools.combine_lines_to_one_file, tools.mult_lines_to_one,
+            tools.polygon_from_files):
+        outputs = []
+        for workers in (1, 3):
+            out = _out(f'{func.__name__}_{workers}.kml')
+            func(paths = PATHS, out = out, workers = workers, window = 2)
+            with open(out, 'rb') as read_obj:
+                outputs.append(read_obj.read())
+        assert outputs[0] == outputs[1]
@@ -0,0 +1,45 @@
+import os
+import sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+ONE_UP = os.path.split(CURRENT_DIR)[0]
+sys.path.append(ONE_UP)
+
+import pprint
+pp = pprint.PrettyPrinter(indent = 4)
+
+import pstats
+
+import tools
+
+TEST2 = os.path.join(CURRENT_DIR, 'test_data', 'test2.gpx')
+
+def _out(name):
+    directory = os.path.join(CURRENT_DIR, 'test_out')
+    os.makedirs(directory, exist_ok = True)
+    return os.path.join(directory, name)
+
+def test_profile_stages():
+    dump = _out('smooth.prof')
+    with tools.profile(dump = dump) as stages:
+        tools.smooth_func(path = TEST2, out = _out('profile_smooth.kml'))
+    assert list(stages.stages) == ['parse', 'smooth', 'write', 'other']
+    for stats in stages.stages.values():
+        assert stats['calls'] == 1
+        assert stats['wall'] >= 0 and stats['cpu'] >= 0
+    assert stages.stages['parse']['peak'] > 0
+    assert pstats.Stats(dump).total_calls > 0
+    assert 'smooth' in tools.format_profile(stages)
+
+def test_nested_stages_are_exclusive():
+    with tools.profile() as stages:
+        with tools.stage('write'):
+            tools.tracks_from_file(TEST2)
+    total = sum(i['wall'] for i in stages.stages.values())
+    assert stages.stages['parse']['wall'] > stages.stages['write']['wall']
+    assert total > stages.stages['parse']['wall']
+
+def test_no_profile():
+    with tools.stage('parse'):
+        tracks = tools.tracks_from_file(TEST2)
+    assert tools._PROFILE is None
+    assert len(tracks) == 1
@@ -8,6 +8,8 @@ import pprint
 pp = pprint.PrettyPrinter(indent = 4)
 import simplify
 
+import numpy as np
+
 import kml
 import gpx
 import tools
@@ -664,3 +666,35 @@ def test_3():
         verbose = True,
         line_name = 'smoothed-line'
         )
+
+def test_simplify_mask():
+    lats, lons = tools.coordinates(POINTS)
+    keep = simplify.simplify_mask(lats, lons, max_distance = 1)
+    assert keep[0] and keep[-1]
+    assert simplify.simplify(points = POINTS, max_distance = 1) == [
+            p for p, k in zip(POINTS, keep) if k]
+    assert simplify.simplify(points = POINTS[:2]) == POINTS[:2]
+
+def test_simplify_long_zigzag():
+    # deep enough that a recursive split would hit the recursion limit
+    n = 5000
+    lats = 47.44 + np.arange(n) * 1e-5
+    lons = -121.67 + np.arange(n) * 1e-6 + (np.arange(n) % 2) * 1e-4
+    keep = simplify.simplify_mask(lats, lons, max_distance = 1)
+    assert keep.all()
+
+def test_simplify_metric_bound():
+    lats, lons = tools.coordinates(POINTS)
+    for max_distance in (0.5, 2, 10):
+        keep = simplify.simplify_mask(lats, lons, max_distance = max_distance)
+        kept = np.flatnonzero(keep)
+        for begin, end in zip(kept[:-1], kept[1:]):
+            d = simplify.deviations(lats[begin:end + 1], lons[begin:end + 1])
+            assert (d < max_distance).all()
+
+def test_distance_from_line():
+    line_point_1 = (47.0, -122.0)
+    line_point_2 = (47.0, -121.999)
+    point = (47.0001, -121.9995)
+    d = simplify.distance_from_line(point, line_point_1, line_point_2)
+    assert abs(d - 0.0001 * simplify.ONE_DEGREE) < 0.01
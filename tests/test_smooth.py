@@ -0,0 +1,38 @@
+import os
+import sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+ONE_UP = os.path.split(CURRENT_DIR)[0]
+sys.path.append(ONE_UP)
+
+import pprint
+pp = pprint.PrettyPrinter(indent = 4)
+
+import geo
+import smooth
+from walk import walk
+
+def test_arc_distances_match_scalar():
+    lats, lons = walk(300)
+    prepared = geo.prepare(lats, lons)
+    xyz = geo.unit_vectors(prepared) * smooth.Re
+    d = smooth._arc_distances(prepared[0], prepared[1], xyz, 10, 250)
+    bounds = (smooth.extract((lats[10], lons[10])),
+            smooth.extract((lats[249], lons[249])))
+    for i in range(10, 250):
+        expected = smooth.greatcircle_point_distance(
+                bounds, smooth.extract((lats[i], lons[i])))
+        assert abs(d[i - 10] - expected) < 1e-6
+
+def test_process_keeps_order_and_default():
+    lats, lons = walk(2000)
+    points = list(zip(lats, lons))
+    first = smooth.process(points, maxdistance = 10, maxinterval = 10)
+    second = smooth.process(points, maxdistance = 10, maxinterval = 10)
+    assert first == second
+    indices = [points.index(i) for i in first]
+    assert indices == sorted(indices)
+
+def test_process_closed_loop():
+    loop = [(47.0, -122.0), (47.001, -122.0), (47.001, -122.001), (47.0, -122.0)]
+    assert smooth.process(loop, maxdistance = 500, maxinterval = 5) == [
+            (47.001, -122.0), (47.001, -122.001)]
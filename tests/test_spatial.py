@@ -0,0 +1,54 @@
+import os
+import sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+ONE_UP = os.path.split(CURRENT_DIR)[0]
+sys.path.append(ONE_UP)
+
+import pprint
+pp = pprint.PrettyPrinter(indent = 4)
+
+import numpy as np
+
+import geo
+import spatial
+import tools
+from walk import walk
+
+def test_query_matches_linear_scan():
+    lats, lons = walk(2000)
+    index = spatial.SpatialIndex(lats, lons)
+    q_lats, q_lons = walk(200, seed = 1)
+    distances, indices = index.query(q_lats, q_lons, k = 2)
+    prepared = geo.prepare(lats, lons)
+    for i in range(len(q_lats)):
+        full = geo.one_to_many(q_lats[i], q_lons[i], prepared)
+        expected = np.lexsort((np.arange(len(full)), full))[:2]
+        assert list(indices[i]) == list(expected)
+        assert np.allclose(distances[i], full[expected])
+
+def test_query_radius_with_mask():
+    lats, lons = walk(2000)
+    index = spatial.SpatialIndex(lats, lons)
+    mask = np.arange(2000) % 3 != 0
+    prepared = geo.prepare(lats, lons)
+    indices, distances = index.query_radius(lats[:50], lons[:50], 25, mask = mask)
+    for i in range(50):
+        full = geo.one_to_many(lats[i], lons[i], prepared)
+        expected = np.flatnonzero((full <= 25) & mask)
+        assert list(indices[i]) == list(expected)
+
+def test_nearest_far_away():
+    lats, lons = walk(100)
+    index = spatial.SpatialIndex(lats, lons)
+    n, d = index.nearest(-33.9, 151.2)
+    prepared = geo.prepare(lats, lons)
+    full = geo.one_to_many(-33.9, 151.2, prepared)
+    assert n == int(np.argmin(full))
+    assert abs(d - full.min()) < 1e-6
+
+def test_find_nearest_list():
+    points = [(47.65846, -122.40767, 0), (47.65859, -122.4075, 0),
+            (47.6586, -122.40749, 0), (47.58124, -122.39294, 0)]
+    n = tools.find_nearest(point = (47.581, -122.3929), points = points)
+    assert n[0] == 3
+    assert tools.find_nearest(point = (47.581, -122.3929), points = []) == (None, None)
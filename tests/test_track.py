@@ -0,0 +1,92 @@
+import os
+import sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+ONE_UP = os.path.split(CURRENT_DIR)[0]
+sys.path.append(ONE_UP)
+
+import pprint
+pp = pprint.PrettyPrinter(indent = 4)
+
+import numpy as np
+
+import tools
+import track
+
+POINTS = [   (47.65846, -122.40767, 0),
+    (47.65859, -122.4075, 1.5),
+    (47.6586, -122.40749, 2.0),
+    (47.6586, -122.40748, 2.5),
+    (47.65867, -122.40745, 3.0)]
+
+def test_tracks_from_file():
+    path = os.path.join(CURRENT_DIR, 'test_data', 'test1.gpx')
+    tracks = tools.tracks_from_file(path = path)
+    assert isinstance(tracks[0], track.Track)
+    assert tracks[0]['name'] == 'Barrett Spur 1'
+    assert list(tracks[0].segments) == [0, 53]
+    point = tracks[0]['points'][0]
+    assert len(point) == 4
+    assert point[0] == tracks[0].lat[0]
+    assert point[3] is None
+
+def test_time_column():
+    path = os.path.join(CURRENT_DIR, 'test_data', 'test2.gpx')
+    tracks = tools.tracks_from_file(path = path)
+    assert tracks[0].time.dtype == np.dtype('datetime64[ms]')
+    point = tracks[0]['points'][0]
+    assert point[3].tzinfo is not None
+    assert point[3].strftime('%Y-%m-%d %H:%M:%S') == '2024-05-29 09:59:03'
+
+def test_from_points_round_trip():
+    t = track.Track.from_points(POINTS, name = 'test')
+    assert len(t) == 5
+    assert list(t['points']) == POINTS
+    assert t['points'][-1] == POINTS[-1]
+    assert t.time is None
+
+def test_slice_shares_columns():
+    t = track.Track.from_points(POINTS, name = 'test')
+    s = t[1:4]
+    assert len(s) == 3
+    assert np.shares_memory(s.lat, t.lat)
+    assert list(s['points']) == POINTS[1:4]
+    assert list(t['points'][1:4]) == POINTS[1:4]
+
+def test_cumulative_distance():
+    t = track.Track.from_points(POINTS, name = 'test')
+    assert t.cumulative_distance[0] == 0
+    assert len(t.segment_lengths) == 4
+    assert abs(t.cumulative_distance[-1] - t.segment_lengths.sum()) < 1e-9
+    d = tools.haversine_distance(
+            latitude_1 = POINTS[0][0],
+            longitude_1 = POINTS[0][1],
+            latitude_2 = POINTS[1][0],
+            longitude_2 = POINTS[1][1])
+    assert abs(t.cumulative_distance[1] - d) < 1e-6
+
+def test_mask_keeps_segments():
+    t = track.Track(name = 'test', lat = np.arange(6.0), lon = np.arange(6.0),
+            segments = [0, 3])
+    s = t[np.array([True, False, True, False, True, True])]
+    assert list(s.lat) == [0, 2, 4, 5]
+    assert list(s.segments) == [0, 2]
+
+def test_local_times():
+    times = np.array(['2024-03-10T09:59:00', '2024-03-10T10:01:00', 'NaT'],
+            dtype = 'datetime64[ms]')
+    local = track.local_times(times, timezone = 'US/Pacific')
+    assert local[0] == np.datetime64('2024-03-10T01:59:00')
+    assert local[1] == np.datetime64('2024-03-10T03:01:00')
+    assert np.isnat(local[2])
+    assert np.array_equal(track.local_times(times, timezone = None), times,
+            equal_nan = True)
+
+def test_datetimes_match_to_datetime():
+    from track import datetimes, _to_datetime
+    times = np.array(['2024-03-10T09:59:59.500', '2024-03-10T10:00:00', 'NaT',
+        '2024-11-03T08:30:00', '2024-11-03T09:30:00'], dtype = 'datetime64[ms]')
+    for timezone in ('US/Pacific', 'Asia/Kolkata', None):
+        got = datetimes(times, timezone)
+        expected = [_to_datetime(i, timezone) for i in times]
+        assert got == expected
+        assert [str(i) for i in got] == [str(i) for i in expected]
@@ -0,0 +1,63 @@
+import os
+import sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+ONE_UP = os.path.split(CURRENT_DIR)[0]
+sys.path.append(ONE_UP)
+
+import pprint
+pp = pprint.PrettyPrinter(indent = 4)
+
+import numpy as np
+import pytest
+
+import tools
+import visvalingam
+from walk import walk
+
+def _by_scan(lats, lons, target = None, area = None):
+    x, y = visvalingam.project(lats, lons)
+    kept = list(range(len(lats)))
+    areas = {i: visvalingam._area(x, y, i - 1, i, i + 1)
+            for i in range(1, len(lats) - 1)}
+    while len(kept) > 2 and (target is None or len(kept) > target):
+        k = min(range(1, len(kept) - 1), key = lambda k: (areas[kept[k]], kept[k]))
+        a = areas[kept[k]]
+        if area is not None and a >= area:
+            break
+        del kept[k]
+        for m in (k - 1, k):
+            if 0 < m < len(kept) - 1:
+                areas[kept[m]] = max(a, visvalingam._area(
+                    x, y, kept[m - 1], kept[m], kept[m + 1]))
+    return kept
+
+def test_target_matches_scan():
+    lats, lons = walk(300)
+    for target in (2, 25, 150):
+        keep = visvalingam.simplify_mask(lats, lons, target = target)
+        assert keep.sum() == target
+        assert list(np.flatnonzero(keep)) == _by_scan(lats, lons, target = target)
+
+def test_area_matches_scan():
+    lats, lons = walk(300)
+    for area in (1, 50):
+        keep = visvalingam.simplify_mask(lats, lons, area = area)
+        assert list(np.flatnonzero(keep)) == _by_scan(lats, lons, area = area)
+
+def test_optimize_func_visvalingam():
+    out = os.path.join(CURRENT_DIR, 'test_out', 'visvalingam.kml')
+    os.makedirs(os.path.dirname(out), exist_ok = True)
+    tools.optimize_func(path = os.path.join(CURRENT_DIR, 'test_data', 'test2.gpx'),
+            out = out, mode = 'visvalingam', target = 40)
+    assert len(tools.tracks_from_file(out)[0]['points']) == 40
+    with pytest.raises(visvalingam.VisvalingamError):
+        visvalingam.simplify_mask(*walk(10))
+
+def test_cli_needs_target_or_area():
+    import subprocess
+    result = subprocess.run([sys.executable, 'map_tools.py', 'optimize',
+        os.path.join(CURRENT_DIR, 'test_data', 'test2.gpx'),
+        '-o', os.path.join(CURRENT_DIR, 'test_out', 'cli_visvalingam.kml'),
+        '--mode', 'visvalingam'], cwd = ONE_UP, capture_output = True, text = True)
+    assert result.returncode == 2
+    assert '--mode visvalingam needs --target or --area' in result.stderr
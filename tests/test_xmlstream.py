@@ -0,0 +1,49 @@
+import os
+import sys
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+ONE_UP = os.path.split(CURRENT_DIR)[0]
+sys.path.append(ONE_UP)
+
+import pprint
+pp = pprint.PrettyPrinter(indent = 4)
+
+import kml
+import tools
+import xmlstream
+
+POINTS = [   (47.65846, -122.40767, 0),
+    (47.65859, -122.4075, 0),
+    (47.6586, -122.40749, 0)]
+
+def _out(name):
+    dir_ = os.path.join(CURRENT_DIR, 'test_out')
+    if not os.path.isdir(dir_):
+        os.mkdir(dir_)
+    return os.path.join(dir_, name)
+
+def test_matches_write_to_path():
+    root = kml.make_write_root()
+    root.append(kml.make_line(name = 'a & b', points = POINTS))
+    root.append(kml.make_point(name = 'p', latitude = 1, longitude = 2))
+    tools.write_to_path(root = root, path = _out('tree.kml'))
+    with xmlstream.XmlStreamWriter(
+            path = _out('stream.kml'), root = kml.make_write_root()) as writer:
+        kml.write_line(writer = writer, name = 'a & b',
+                point_chunks = [POINTS[:1], [], POINTS[1:]])
+        writer.element(kml.make_point(name = 'p', latitude = 1, longitude = 2))
+    with open(_out('tree.kml'), 'rb') as a, open(_out('stream.kml'), 'rb') as b:
+        assert a.read() == b.read()
+
+def test_error_leaves_no_output():
+    out = _out('broken.kml')
+    with open(out, 'w') as write_obj:
+        write_obj.write('old')
+    try:
+        with xmlstream.XmlStreamWriter(path = out, root = kml.make_write_root()) as writer:
+            writer.start('Folder')
+            raise ValueError('parse failed')
+    except ValueError:
+        pass
+    with open(out) as read_obj:
+        assert read_obj.read() == 'old'
+    assert not [i for i in os.listdir(os.path.dirname(out)) if i.endswith('.tmp')]
@@ -0,0 +1,25 @@
+"""
+Synthetic tracks shared by the tests.
+"""
+import numpy as np
+
+from track import Track
+
+def walk(n, seed = 0, step = 3e-5):
+    """
+    (lats, lons) of a random walk of n points near Snoqualmie Pass, every
+    step about step degrees.
+    """
+    rng = np.random.default_rng(seed)
+    lats = 47.44 + np.cumsum(rng.normal(0, step, n))
+    lons = -121.67 + np.cumsum(rng.normal(0, step, n))
+    return lats, lons
+
+def walk_track(n, seed = 0, step = 3e-5):
+    """
+    walk as a Track, with a random walk of elevations too.
+    """
+    lats, lons = walk(n, seed = seed, step = step)
+    rng = np.random.default_rng(seed + 1)
+    return Track(name = 'walk', lat = lats, lon = lons,
+            ele = 400 + np.cumsum(rng.normal(0, 1, n)))
@@ -1,12 +1,17 @@
 import os
 import  math
-from statistics import median
+import time
+import functools
+import contextlib
 import kml
 import gpx
-import smooth
-import optimize
 import pprint
-import csv
+import numpy as np
+import geo
+import cache
+import binary
+import atomic
+from track import Track, PointsView, coordinates, local_times
 pp = pprint.PrettyPrinter(indent = 4)
 
 try:
@@ -17,6 +22,128 @@ except ImportError:
 class ToolsError(Exception):
     pass
 
+MILE = 1609.344
+UNITS = {'mi': MILE, 'km': 1000.0, 'm': 1.0}
+EXECUTORS = ('process', 'thread')
+
+_PROFILE = None
+
+class StageProfile:
+    """
+    Wall time, CPU time and peak traced memory of every stage run while a
+    profile is active (see profile). A stage run inside another is not
+    counted in the other's times; its memory is, as it adds to the other's
+    peak.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self._stack = []
+
+    def enter(self, name):
+        import tracemalloc
+        if self._stack:
+            parent = self._stack[-1]
+            parent['peak'] = max(parent['peak'], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        self._stack.append({'name': name, 'wall': time.perf_counter(),
+            'cpu': time.process_time(), 'child_wall': 0.0, 'child_cpu': 0.0,
+            'peak': 0})
+
+    def exit(self):
+        import tracemalloc
+        frame = self._stack.pop()
+        wall = time.perf_counter() - frame['wall']
+        cpu = time.process_time() - frame['cpu']
+        peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+        stats = self.stages.setdefault(frame['name'],
+                {'calls': 0, 'wall': 0.0, 'cpu': 0.0, 'peak': 0})
+        stats['calls'] += 1
+        stats['wall'] += wall - frame['child_wall']
+        stats['cpu'] += cpu - frame['child_cpu']
+        stats['peak'] = max(stats['peak'], peak)
+        if self._stack:
+            parent = self._stack[-1]
+            parent['child_wall'] += wall
+            parent['child_cpu'] += cpu
+            parent['peak'] = max(parent['peak'], peak)
+
+@contextlib.contextmanager
+def profile(dump = None):
+    """
+    Profile the stages (parse, transforms, write) run in the block; yields
+    the StageProfile, whose stages are complete when the block ends. Time
+    outside any stage is counted as 'other'. Memory is traced with
+    tracemalloc, which slows allocation-heavy code down. With dump a
+    cProfile of the block is written to that path as well.
+
+        with tools.profile() as p:
+            tools.smooth_func(path, out)
+        print(tools.format_profile(p))
+    """
+    global _PROFILE
+    import tracemalloc
+    profiler = None
+    if dump:
+        import cProfile
+        profiler = cProfile.Profile()
+    stages = StageProfile()
+    tracemalloc.start()
+    _PROFILE = stages
+    stages.enter('other')
+    try:
+        if profiler is not None:
+            profiler.enable()
+        yield stages
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(dump)
+        stages.exit()
+        _PROFILE = None
+        tracemalloc.stop()
+
+@contextlib.contextmanager
+def stage(name):
+    """
+    Count the block as stage name of the running profile, if there is one.
+    """
+    if _PROFILE is None:
+        yield
+        return
+    _PROFILE.enter(name)
+    try:
+        yield
+    finally:
+        _PROFILE.exit()
+
+def _timed(name):
+    """
+    Decorator running every call of the function as stage name.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _PROFILE is None:
+                return func(*args, **kwargs)
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def format_profile(stage_profile) -> str:
+    lines = [f'{"stage":<14}{"calls":>6}{"wall s":>10}{"cpu s":>10}{"peak MB":>10}']
+    total_wall = total_cpu = 0.0
+    for name, stats in stage_profile.stages.items():
+        lines.append(f'{name:<14}{stats["calls"]:>6}{stats["wall"]:>10.3f}'
+                f'{stats["cpu"]:>10.3f}{stats["peak"] / 1e6:>10.1f}')
+        total_wall += stats['wall']
+        total_cpu += stats['cpu']
+    peak = max((i['peak'] for i in stage_profile.stages.values()), default = 0)
+    lines.append(f'{"total":<14}{"":>6}{total_wall:>10.3f}{total_cpu:>10.3f}'
+            f'{peak / 1e6:>10.1f}')
+    return '\n'.join(lines)
+
 def haversine_distance(
     latitude_1: float, 
     longitude_1: float, 
@@ -41,74 +168,120 @@ def haversine_distance(
 
     return d
 
-def reverse_points(points):
-    points_ = [x for x in points]
-    for i in reversed(points):
-        points_.append(i)
-    return points_
-
+@_timed('mile_markers')
 def create_mile_markers(points, 
         reverse = False,
-        verbose = False):
-    if reverse:
-        points = reverse_points(points)
-    total_distance = 0
-    prev_point = None
-    prev_mile = None
+        verbose = False,
+        interval = 1,
+        unit = 'mi',
+        precision = 6,
+        ele_precision = 1):
+    """
+    A marker every interval units (a key of UNITS) along the track, placed
+    exactly at the boundary by interpolating between the two points around
+    it. With reverse the route is walked out and back, the markers going on
+    along the way back.
+
+    Every boundary is found at once with searchsorted on the cumulative
+    distance of the track; the way back is mapped onto the same array, so
+    the points are not copied.
+
+    Returns dicts of 'mile' (the marker's distance in unit, an int when
+    whole), 'distance' (meters), 'latitude', 'longitude' and 'elevation'
+    (None when the track has none). The interpolated latitude and longitude
+    are rounded to precision decimals and the elevation to ele_precision
+    (None keeps full precision).
+    """
+    if unit not in UNITS:
+        raise ToolsError(f'unit must be one of {list(UNITS)}')
+    if interval <= 0:
+        raise ToolsError('interval must be positive')
+    track = Track.from_points(points)
+    if len(track) < 2:
+        return []
+    cumulative = track.cumulative_distance
+    length = cumulative[-1]
+    total = 2 * length if reverse else length
+    step = interval * UNITS[unit]
+    # the small slack keeps a marker that lands on the very end
+    counts = np.arange(1, int(total / step * (1 + 1e-12)) + 1)
+    distances = counts * step
+    along = np.where(distances > length, 2 * length - distances, distances)
+    along = np.clip(along, 0, length)
+    i = np.clip(np.searchsorted(cumulative, along, side = 'right') - 1,
+            0, len(track) - 2)
+    segment = cumulative[i + 1] - cumulative[i]
+    fraction = np.divide(along - cumulative[i], segment,
+            out = np.zeros(len(along)), where = segment > 0)
+
+    def interpolate(column, decimals):
+        values = column[i] + (column[i + 1] - column[i]) * fraction
+        if decimals is not None:
+            values = np.round(values, decimals)
+        return values.tolist()
+
+    lats = interpolate(track.lat, precision)
+    lons = interpolate(track.lon, precision)
+    eles = [None] * len(counts)
+    if track.ele is not None:
+        eles = [None if np.isnan(i) else i
+                for i in interpolate(track.ele, ele_precision)]
+    labels = [int(i) if float(i).is_integer() else i
+            for i in np.round(counts * interval, 9).tolist()]
     miles = []
-    for point in points:
-        if not prev_point:
-            prev_point = point
-            continue
-        dis =  haversine_distance(
-            latitude_1 = prev_point[0], 
-            longitude_1= prev_point[1], 
-            latitude_2= point[0], 
-            longitude_2= point[1])     
-        total_distance += dis
-        if prev_mile != None and math.floor(total_distance * 0.000621371) != prev_mile:
-            mile_mark = math.floor(total_distance * 0.000621371)
-            miles.append({'mile':mile_mark,
-                'latitude':point[0],
-                'longitude': point[1],
-                'elevation': point[2]
-                }
-                    )
-        prev_mile = math.floor(total_distance * 0.000621371)
-        prev_point = point
+    for label, distance, lat, lon, ele in zip(
+            labels, distances.tolist(), lats, lons, eles):
+        miles.append({'mile': label,
+            'distance': distance,
+            'latitude': lat,
+            'longitude': lon,
+            'elevation': ele
+            }
+                )
     return miles
 
 
+def _prepare_points(points):
+    """
+    Radians and latitude cosines for a Track, a PointsView or a list of
+    (lat, lon, ...) points, ready for the batch functions in geo. Tracks
+    cache theirs.
+    """
+    if isinstance(points, PointsView):
+        points = points.track
+    if isinstance(points, Track):
+        return points.prepared
+    lats = np.fromiter((i[0] for i in points), dtype = float, count = len(points))
+    lons = np.fromiter((i[1] for i in points), dtype = float, count = len(points))
+    return geo.prepare(lats, lons)
+
+def _index(points):
+    """
+    spatial.SpatialIndex for a Track, a PointsView or a list of points.
+    Tracks build theirs once and keep it.
+    """
+    if isinstance(points, PointsView):
+        points = points.track
+    if isinstance(points, Track):
+        return points.index
+    import spatial
+    return spatial.SpatialIndex.from_points(points)
+
 def find_nearest(point, points, verbose = False):
-    nearest = (None, None)
-    for counter, i in enumerate(points):
-        distance = haversine_distance(
-            latitude_1 =  point[0], 
-            longitude_1 = point[1], 
-            latitude_2 = i[0], 
-            longitude_2 = i[1]    
-        )
-        if nearest[1] == None or distance < nearest[1]:
-            nearest = (counter, distance)
+    nearest = _index(points).nearest(
+            latitude = point[0],
+            longitude = point[1])
     if verbose:
         pass
         #print(f'nearest is {nearest}')
     return nearest
 
 def find_nearest_distance(point, points, distance, verbose = False):
-    final = []
-    for counter, i in enumerate(points):
-        distance_ = haversine_distance(
-            latitude_1 =  point[0], 
-            longitude_1 = point[1], 
-            latitude_2 = i[0], 
-            longitude_2 = i[1]    
-        )
-        if distance_ == 0:
-            continue
-        elif distance_ <= distance:
-            final.append(i)
-    return final
+    indices, distances = _index(points).within(
+            latitude = point[0],
+            longitude = point[1],
+            radius = distance)
+    return [points[i] for i in indices[distances != 0]]
 
 def find_highest(points, verbose = False):
     highest = (None, None)
@@ -120,144 +293,284 @@ def find_highest(points, verbose = False):
             highest = (counter, height)
     return highest
 
-
-
-
-
-
-def _get_median(points):
-    lats = []
-    longs = []
-    for i in points:
-        lats.append(i[0])
-        longs.append(i[1])
-    lats = sorted(lats)
-    longs = sorted(longs)
-    return median(lats), median (longs)
-
-
-def _too_far(dis, max_ = 15):
-    if dis < max_:
-        return False
-    return True
-
-def merge_lines(tracks):
-    points = []
+@_timed('merge')
+def merge_lines(tracks, processes = None):
+    import merge
     base_track = tracks[0][0]['points']
-    final = []
-    n_lons = []
-    n_lats = []
-    for p in base_track:
-        temp_ = [p]
-        for i in tracks[1:]:
-            index, dist = find_nearest(p, i[0]['points'])
-            if not _too_far(dist):
-                temp_.append(i[0]['points'][index])
-            n_lat, n_lon  = _get_median(points = temp_)
-            final.append((n_lat, n_lon))
-    for i in final:
-        points.append((i[0], i[1], 0))
+    lats, lons = merge.merge_tracks(
+            base = base_track,
+            others = [i[0]['points'] for i in tracks[1:]],
+            processes = processes)
+    points = []
+    for lat, lon in zip(lats.tolist(), lons.tolist()):
+        points.append((lat, lon, 0))
     return points
 
-def tracks_from_file(path, verbose = False) -> object:
+@_timed('parse')
+def tracks_from_file(path, verbose = False) -> list:
+    """
+    Read a gpx, kml or binary track (.mtb, see binary.write_tracks) file
+    into a list of track.Track objects.
+
+    track['name'] and track['points'] still work on each, so callers written
+    for the old {'name', 'points'} dicts do not need to change.
+
+    When a parse cache is configured (see cache.from_environment) a file
+    read before is loaded from it instead of being parsed.
+    """
     ext = os.path.splitext(path)[1]
+    if ext == binary.EXTENSION:
+        return binary.read_tracks(path)
+    if ext not in ('.gpx', '.kml'):
+        raise ValueError('no match')
+    parse_cache = cache.from_environment()
+    if parse_cache is not None:
+        tree = parse_cache.get(path)
+        if tree is not None:
+            if verbose:
+                print(f'read {path} from the cache')
+            return tree
     if ext == '.gpx':
         tree = gpx.tracks_from_gpx(path = path, verbose = verbose)
-    elif ext == '.kml':
-        tree = kml.tracks_from_kml(path = path, verbose = verbose)
     else:
-        raise ValueError('no match')
+        tree = kml.tracks_from_kml(path = path, verbose = verbose)
+    if parse_cache is not None:
+        parse_cache.put(path, tree)
     return tree
 
+def _parse_one(path):
+    # the undecorated function: worker threads must not touch the profile,
+    # whose stage stack belongs to the main thread
+    return tracks_from_file.__wrapped__(path = path)
+
+def parse_files(paths, workers = None, executor = 'process', window = None,
+        verbose = False):
+    """
+    Yield tracks_from_file(path) for every path, in the order of paths,
+    parsing them on a pool of workers ('process' or 'thread' executor; all
+    cores by default, 1 parses them in this process, one at a time).
+
+    At most window files (twice the workers by default) are parsed or
+    waiting to be used at any time, so memory holds a bounded number of
+    parsed files however many paths there are. Time spent waiting for a
+    file counts as the parse stage of a profile.
+    """
+    if executor not in EXECUTORS:
+        raise ToolsError(f'executor must be one of {EXECUTORS}')
+    paths = list(paths)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(paths))
+    if workers < 2:
+        for path in paths:
+            yield tracks_from_file(path = path, verbose = verbose)
+        return
+    if window is None:
+        window = 2 * workers
+    window = max(window, 1)
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+    pool = ProcessPoolExecutor if executor == 'process' else ThreadPoolExecutor
+    with pool(max_workers = workers) as ex:
+        pending = deque()
+        for path in paths:
+            if len(pending) == window:
+                with stage('parse'):
+                    tracks = pending.popleft().result()
+                yield tracks
+            pending.append(ex.submit(_parse_one, path))
+            if verbose:
+                print(f'parsing {path}')
+        while pending:
+            with stage('parse'):
+                tracks = pending.popleft().result()
+            yield tracks
+
+def to_binary(path, out, verbose = False):
+    binary.write_tracks(out, tracks_from_file(path = path, verbose = verbose))
+    if verbose:
+        print(f'wrote to {out}')
 
 def get_tree(path):
     with open(path, 'r') as read_obj:
         tree = etree.parse(read_obj)
     return tree
 
+@_timed('write')
 def write_to_path(root, path, verbose = False):
-    s =  etree.tostring(root)
-    with open(path, 'wb') as write_obj:
-        write_obj.write(s)
+    # ElementTree.write serializes straight into the file, without first
+    # building the whole document as one bytes object
+    with atomic.replacing(path, 'wb') as write_obj:
+        etree.ElementTree(root).write(write_obj)
     if verbose:
         print(f'wrote to {path}')
 
 
-def combine_lines_to_one_file(paths, out, verbose = False):
-    root = kml.make_write_root()
-    folder =etree.Element("Folder") 
-    root.append(folder)
-    for path in paths:
-        tracks = tracks_from_file(path = path)
-        for track in tracks:
-            line_el = kml.make_line(name = track['name'], 
-                        points = track['points'])
-            folder.append(line_el)
-    write_to_path(
-            root = root, 
-            path = out, 
-            verbose = verbose)
+def combine_lines_to_one_file(paths, out, verbose = False, workers = None,
+        executor = 'process', window = None):
+    import xmlstream
+    with stage('write'), xmlstream.XmlStreamWriter(
+            path = out,
+            root = kml.make_write_root(),
+            verbose = verbose) as writer:
+        writer.start('Folder')
+        for tracks in parse_files(paths, workers = workers,
+                executor = executor, window = window):
+            for track in tracks:
+                line_el = kml.make_line(name = track['name'], 
+                            points = track['points'])
+                writer.element(line_el)
+        writer.end()
+
+def _start_trk(writer, name):
+    writer.start('trk')
+    if name:
+        writer.start('name')
+        writer.text(name)
+        writer.end()
+
+def _write_wpt(writer, point):
+    writer.element(gpx.add_wpx(
+            lattitude = point['points'][0], 
+            longitude = point['points'][1], 
+            elevation = point['points'][2],
+            name = point['name']))
+
+def _write_trk(writer, track, precision, ele_precision):
+    _start_trk(writer, track.name)
+    for segment in track.iter_segments():
+        gpx.write_trkseg(writer, segment, precision = precision,
+                ele_precision = ele_precision)
+    writer.end()
+
+def _staged(items, name):
+    # pull every item of an iterator as stage name, the consumer's work
+    # staying outside of it
+    while True:
+        with stage(name):
+            item = next(items, None)
+        if item is None:
+            return
+        yield item
+
+def convert_to_gpx(path, out, verbose = False, precision = None,
+        ele_precision = None):
+    """
+    Write the waypoints and tracks of a gpx, kml or binary track file to
+    out as gpx, parsing the input once. Track points are written in bulk
+    by gpx.write_trkseg, with precision and ele_precision decimals.
+
+    A gpx input is streamed through gpx.iter_gpx: every wpt and trkseg is
+    written as soon as it is read, so only one segment is in memory. When a
+    parse cache is configured a cached gpx is loaded from it instead (with
+    only its waypoints read from the file), and a gpx not cached yet is
+    added to it. kml mixes its points and lines while gpx wants the
+    waypoints first, so a kml input is read whole by kml.read_kml (still a
+    single pass).
+    """
+    ext = os.path.splitext(path)[1]
+    if ext not in ('.gpx', '.kml', binary.EXTENSION):
+        raise ToolsError(f'{path} is not a gpx, kml or binary track file')
+    parse_cache = None
+    tracks = None
+    if ext == binary.EXTENSION:
+        tracks = tracks_from_file(path = path, verbose = verbose)
+    elif ext == '.gpx':
+        parse_cache = cache.from_environment()
+        if parse_cache is not None:
+            with stage('parse'):
+                tracks = parse_cache.get(path)
+    import xmlstream
+    with stage('write'), xmlstream.XmlStreamWriter(
+            path = out,
+            root = gpx.make_write_root(),
+            verbose = verbose) as writer:
+        if ext == '.kml':
+            with stage('parse'):
+                tracks, point_list = kml.read_kml(
+                        path = path,
+                        verbose = verbose)
+            for i in point_list:
+                _write_wpt(writer, i)
+            for track in tracks:
+                _write_trk(writer, track, precision, ele_precision)
+            return
+        if tracks is not None:
+            if ext == '.gpx':
+                if verbose:
+                    print(f'read {path} from the cache')
+                with stage('parse'):
+                    point_list = gpx.read_waypoints(path)
+                for i in point_list:
+                    _write_wpt(writer, i)
+            for track in tracks:
+                _write_trk(writer, track, precision, ele_precision)
+            return
+        open_track = None
+        # what tracks_from_gpx would give, kept for the cache
+        parsed = []
+        segments = []
+        for kind, track_counter, value in _staged(gpx.iter_gpx(path), 'parse'):
+            if kind == 'waypoint':
+                _write_wpt(writer, value)
+            elif kind == 'segment':
+                if open_track != track_counter:
+                    _start_trk(writer, value.name)
+                    open_track = track_counter
+                gpx.write_trkseg(writer, value, precision = precision,
+                        ele_precision = ele_precision)
+                if parse_cache is not None:
+                    segments.append(value)
+            else:
+                if open_track != track_counter:
+                    # a trk without segments
+                    _start_trk(writer, value)
+                writer.end()
+                open_track = None
+                if parse_cache is not None:
+                    parsed.append(gpx.join_segments(name = value, segments = segments))
+                    segments = []
+    if parse_cache is not None:
+        parse_cache.put(path, parsed)
 
-def convert_to_gpx(path, out, verbose = False):
-    root = gpx.make_write_root()
-    tracks = tracks_from_file(path = path)
-    tree = get_tree(path = path)
-    #TODO fix
-    point_list = kml.get_points(
-            tree = tree,
-            verbose = verbose)
-    for i in point_list:
-        wpx = gpx.add_wpx(
-                lattitude = i['points'][0], 
-                longitude = i['points'][1], 
-                elevation = i['points'][2],
-                name = i['name'])
-        root.append(wpx)
-    for track in tracks:
-        trk = gpx.make_trk_element(name = track['name'])
-        root.append(trk)
-        trkseg = gpx.make_trkseg(coordinates = track['points'])
-        trk.append(trkseg)
-    write_to_path(
-            root = root, 
-            path = out, 
-            verbose = verbose)
-        
 def _get_cluster(point, points, max_):
     final = []
     for i in points:
-        for j in i:
-            dis = haversine_distance(
-                latitude_1 = point[0] , 
-                longitude_1= point[1], 
-                latitude_2 =j[0]  , 
-                longitude_2= j[1] )
-            if dis <= max_:
-                final.append((j[0], j[1]))
+        if len(i) == 0:
+            continue
+        indices, distances = _index(i).within(
+                latitude = point[0],
+                longitude = point[1],
+                radius = max_)
+        for j in indices:
+            final.append((i[j][0], i[j][1]))
     return final
 
-def mile_markers(path, out, reverse = False, verbose = False):
-    root = kml.make_write_root()
-    document_e =etree.Element("Document") 
-    root.append(document_e)
+def mile_markers(path, out, reverse = False, verbose = False,
+        interval = 1, unit = 'mi'):
     tracks = tracks_from_file(path = path)
-    for track in tracks:
-        points = track['points']
-        miles = create_mile_markers(
-                points = points, 
-                reverse = reverse)
-        for mile in miles:
-            p =kml.make_point(
-                    name = mile['mile'], 
-                    latitude = mile['latitude'], 
-                    longitude =  mile['longitude'], 
-                    description = None,
-                    elevation = mile['elevation'])
-            document_e.append(p)
-    write_to_path(
-            root = root, 
+    import xmlstream
+    with stage('write'), xmlstream.XmlStreamWriter(
             path = out,
-            verbose = verbose)
+            root = kml.make_write_root(),
+            verbose = verbose) as writer:
+        writer.start('Document')
+        for track in tracks:
+            points = track['points']
+            miles = create_mile_markers(
+                    points = points, 
+                    reverse = reverse,
+                    interval = interval,
+                    unit = unit)
+            for mile in miles:
+                p =kml.make_point(
+                        name = mile['mile'], 
+                        latitude = mile['latitude'], 
+                        longitude =  mile['longitude'], 
+                        description = None,
+                        elevation = mile['elevation'] or 0)
+                writer.element(p)
+        writer.end()
 
 def prune_by_location(
         points:list, 
@@ -319,32 +632,38 @@ def mult_lines_to_one(
         paths, 
         out, 
         verbose = False,
-        line_name = 'new-line'
+        line_name = 'new-line',
+        workers = None,
+        executor = 'process',
+        window = None
         ):
-    points = []
-    for path in paths:
-        tracks = tracks_from_file(path = path)
-        for track in tracks: 
-            for i in track['points']:
-                points.append(i)
-    line_element = kml.make_line(
-            name = line_name, points = points)
-    root = kml.make_write_root()
-    root.append(line_element)
-    write_to_path(
-            root = root, 
+    def point_chunks():
+        for tracks in parse_files(paths, workers = workers,
+                executor = executor, window = window):
+            for track in tracks: 
+                yield track['points']
+    import xmlstream
+    with stage('write'), xmlstream.XmlStreamWriter(
             path = out,
-            verbose = verbose)
+            root = kml.make_write_root(),
+            verbose = verbose) as writer:
+        kml.write_line(
+                writer = writer,
+                name = line_name,
+                point_chunks = point_chunks())
 
 def polygon_from_files(
         paths,
         out,
         verbose = False,
-        polygon_name = 'new-polygon'
+        polygon_name = 'new-polygon',
+        workers = None,
+        executor = 'process',
+        window = None
         ):
     points = []
-    for path in paths:
-        tracks = tracks_from_file(path = path)
+    for tracks in parse_files(paths, workers = workers,
+            executor = executor, window = window):
         for track  in  tracks:
             for j in track['points']:
                 points.append(j)
@@ -388,12 +707,14 @@ def smooth_func(
             path = path, 
             verbose = verbose)
     assert len(tracks) == 1
-    smoothed_points = smooth.process(
-            points = tracks[0]['points'],
-            verbose = verbose,
-            maxdistance = 300, 
-            maxinterval = 5,
-            )
+    import smooth
+    with stage('smooth'):
+        smoothed_points = smooth.process(
+                points = tracks[0]['points'],
+                verbose = verbose,
+                maxdistance = 300, 
+                maxinterval = 5,
+                )
     line_element = kml.make_line(
             name = line_name, 
             points = smoothed_points
@@ -406,20 +727,8 @@ def smooth_func(
 
 
 def avg_points(points):
-    prev_point = None
-    dis = []
-    for i in points:
-        if not prev_point:
-            prev_point = i
-            continue
-        d =  haversine_distance(
-                latitude_1 =  prev_point[0], 
-                longitude_1 = prev_point[1], 
-                latitude_2 =  i[0], 
-                longitude_2 =  i[1])     
-        dis.append(d)
-        prev_point = i
-    return sum(dis)/len(dis),  median(dis)
+    dis = geo.segment_distances(_prepare_points(points))
+    return float(np.mean(dis)),  float(np.median(dis))
 
 def stats(
         path,
@@ -433,87 +742,51 @@ def stats(
         a = avg_points(points = points)
 
 def get_within_distance(point, points, distance):
-    final = []
-    indices = []
-    for point_ in points:
-        d =  haversine_distance(
-            latitude_1 =  point_[0], 
-            longitude_1 =  point_[1], 
-            latitude_2 =  point[0], 
-            longitude_2 =  point[1])     
-        if d <= distance:
-            final.append(point_)
-            indices.append(0)
+    indices, distances = _index(points).within(
+            latitude = point[0],
+            longitude = point[1],
+            radius = distance)
+    indices = indices.tolist()
+    final = [points[i] for i in indices]
     return final, indices
 
 def get_new_current(clus, points):
-    min_ = (None, None)
-    for i in clus:
-        for counter, j in enumerate(points):
-            d =  haversine_distance(
-                latitude_1 =  i[0], 
-                longitude_1 =  i[1], 
-                latitude_2 =  j[0], 
-                longitude_2 =  j[1])     
-            if min_[1] == None or d < min_[1]:
-                min_ = (j, d)
-    return min_[0]
-
-
+    if len(clus) == 0 or len(points) == 0:
+        return None
+    lats, lons = coordinates(clus)
+    distances, indices = _index(points).query(lats, lons, k = 1)
+    # the first cluster member with the overall smallest distance, as the
+    # nested loop this replaces did
+    row = int(np.argmin(distances[:, 0]))
+    return points[int(indices[row, 0])]
+
+
+def _subset(points, indices):
+    if isinstance(points, PointsView):
+        points = points.track
+    if isinstance(points, Track):
+        return points[indices]['points']
+    return [points[i] for i in indices]
+
+@_timed('cluster')
 def cluster_it(points, cluster_distance, max_iterations):
-    final = []
-    current = points[0]
-    counter = 0
-    temp_points = []
-    for i in points:
-        temp_points.append(i)
-    while 1:
-        counter += 1
-        counter2 = 0
-        while 1:
-            counter2 += 1
-            clus, indices = get_within_distance(
-                    point = current,
-                    points = temp_points,
-                    distance = cluster_distance * counter2
-                    )
-            if len(clus) > 0:
-                break
-            else:
-                print('did not find cluster, trying again')
-            if counter2 > 10:
-                raise ValueError('tried 10 times and could not find cluster')
-        final.append(clus)
-        temp = []
-        for i in temp_points:
-            if i in clus:
-                continue
-            temp.append(i)
-        temp_points = temp
-        n_current = get_new_current(clus, temp_points)
-        if not n_current:
-            return final, temp_points, current
-        d_temp =  haversine_distance(
-                latitude_1 =  n_current[0], 
-                longitude_1 =  n_current[1], 
-                latitude_2 =  current[0], 
-                longitude_2 =  current[1])     
-        #print(f'dis between old and new is {d_temp}')
-        if d_temp > 1000:
-            return final, temp_points, current
-        current = n_current
-        if current in clus:
-            assert False
-        if counter == max_iterations or len(temp_points) == 0:
-            break
-
-    return final, temp_points, current
+    import clustering
+    lats, lons = coordinates(points)
+    clusters, remaining, current = clustering.cluster_indices(
+            lats = lats,
+            lons = lons,
+            cluster_distance = cluster_distance,
+            max_iterations = max_iterations,
+            index = _index(points))
+    final = [_subset(points, i) for i in clusters]
+    temp_points = _subset(points, np.flatnonzero(remaining))
+    return final, temp_points, points[current]
 
 def med_of_clusters(clusters):
     final = []
     for i in clusters:
-        lat, lon = _get_median(i)
-        final.append((lat, lon, 0))
+        lats, lons = coordinates(i)
+        final.append((float(np.median(lats)), float(np.median(lons)), 0))
     return final
 
 def cluster(path,
@@ -532,14 +805,30 @@ def cluster(path,
     return clusters, meds, remaining, next_
 
 def optimize_func(
-        path, out, line_name = 'new-line', verbose = False):
+        path, out, line_name = 'new-line', verbose = False,
+        mode = 'rdp', target = None, area = None):
+    """
+    mode 'rdp' is optimize.optimize_points; mode 'visvalingam' keeps target
+    points or drops every point whose triangle is under area square meters
+    (see visvalingam.simplify_mask).
+    """
     tracks = tracks_from_file(
             path = path, 
             verbose = verbose)
     assert len(tracks) == 1
-    o_points = optimize.optimize_points(
-            points = tracks[0]['points']
-            )
+    if mode == 'visvalingam':
+        import visvalingam
+        with stage('optimize'):
+            o_points = visvalingam.simplify(
+                    points = tracks[0]['points'],
+                    target = target,
+                    area = area)
+    else:
+        import optimize
+        with stage('optimize'):
+            o_points = optimize.optimize_points(
+                    points = tracks[0]['points']
+                    )
     line_element = kml.make_line(
             name = line_name, 
             points = o_points
@@ -551,19 +840,28 @@ def optimize_func(
             verbose = verbose)
 
 def csv_func(
-        path, out,  verbose = False):
+        path, out,  verbose = False, timezone = 'US/Pacific'):
+    import csv
     tracks = tracks_from_file(
             path = path, 
             verbose = verbose)
     assert len(tracks) == 1
-    with open(out, 'w') as write_obj:
-        header = ['time', 'elevation']
+    track_ = tracks[0]
+    the_times = [None] * len(track_)
+    if track_.time is not None:
+        local = local_times(track_.time, timezone = timezone)
+        the_times = np.datetime_as_string(local, unit = 's').tolist()
+        the_times = [None if i == 'NaT' else i.replace('T', ' ')
+                for i in the_times]
+    # no elevation is an empty cell
+    feet = [None] * len(track_)
+    if track_.ele is not None:
+        missing = np.isnan(track_.ele)
+        feet = np.round(np.where(missing, 0, track_.ele) * 3.28084).astype(
+                np.int64).tolist()
+        feet = [None if m else i for i, m in zip(feet, missing.tolist())]
+    with atomic.replacing(out, 'w') as write_obj:
         csv_writer = csv.writer(write_obj)
-        for counter, i in enumerate(tracks[0]['points']):
-            if counter == 0:
-                csv_writer.writerow(['time', 'elevation'])
-            the_time = None
-            if len(i) == 4:
-                the_time = i[3].strftime('%Y-%m-%d %H:%M:%S')
-            csv_writer.writerow([the_time, round(i[2] * 3.28084)])
-
+        if len(track_):
+            csv_writer.writerow(['time', 'elevation'])
+        csv_writer.writerows(zip(the_times, feet))
@@ -0,0 +1,310 @@
+import math
+import datetime
+from datetime import timezone
+from collections.abc import Sequence
+from functools import cached_property
+
+import numpy as np
+
+import geo
+
+TIME_DTYPE = 'datetime64[ms]'
+DEFAULT_TIMEZONE = 'US/Pacific'
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo = timezone.utc)
+
+class TrackError(Exception):
+    pass
+
+class Track:
+    """
+    A track held as contiguous NumPy columns instead of a list of tuples.
+
+    lat and lon are float64 degrees, ele is float64 meters, time is
+    datetime64[ms] in UTC with NaT for missing values; a missing elevation
+    is NaN, given as None in point tuples. ele and time are None when the
+    source has no such column. segments holds the start offset of
+    every track segment; the first is always 0.
+
+    Slicing returns a Track whose columns are views of this one. Old callers
+    can keep using track['name'] and track['points']; the latter is a
+    PointsView that yields (lat, lon, ele, time) tuples on demand.
+    """
+
+    def __init__(self, name, lat, lon, ele = None, time = None,
+            segments = None, timezone = DEFAULT_TIMEZONE):
+        self.name = name
+        self.lat = np.asarray(lat, dtype = np.float64)
+        self.lon = np.asarray(lon, dtype = np.float64)
+        self.ele = None if ele is None else np.asarray(ele, dtype = np.float64)
+        self.time = None if time is None else np.asarray(time, dtype = TIME_DTYPE)
+        if segments is None:
+            segments = [0]
+        self.segments = np.asarray(segments, dtype = np.int64)
+        self.timezone = timezone
+        for column in (self.lon, self.ele, self.time):
+            if column is not None and len(column) != len(self.lat):
+                raise TrackError('columns must all have the same length')
+
+    @classmethod
+    def from_points(cls, points, name = None, timezone = DEFAULT_TIMEZONE):
+        """
+        Build a Track from a list of (lat, lon[, ele[, time]]) tuples.
+        """
+        if isinstance(points, Track):
+            return points
+        if isinstance(points, PointsView):
+            return points.track
+        n = len(points)
+        width = len(points[0]) if n else 2
+        lat = np.fromiter((i[0] for i in points), dtype = np.float64, count = n)
+        lon = np.fromiter((i[1] for i in points), dtype = np.float64, count = n)
+        ele = None
+        if width > 2:
+            ele = np.fromiter((np.nan if i[2] is None else i[2] for i in points),
+                    dtype = np.float64, count = n)
+        time = None
+        if width > 3:
+            time = np.array([_to_datetime64(i[3]) for i in points],
+                    dtype = TIME_DTYPE)
+        return cls(name = name, lat = lat, lon = lon, ele = ele, time = time,
+                timezone = timezone)
+
+    def __len__(self):
+        return len(self.lat)
+
+    def __iter__(self):
+        return iter(self.points)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            if key == 'name':
+                return self.name
+            if key == 'points':
+                return self.points
+            raise KeyError(key)
+        if isinstance(key, (int, np.integer)):
+            return self.point(key)
+        return self._take(key)
+
+    def __repr__(self):
+        return f'Track(name={self.name!r}, points={len(self)})'
+
+    @property
+    def points(self):
+        return PointsView(self)
+
+    @property
+    def nbytes(self):
+        return sum(i.nbytes for i in
+                (self.lat, self.lon, self.ele, self.time, self.segments)
+                if i is not None)
+
+    @cached_property
+    def prepared(self):
+        """
+        Radians and latitude cosines, see geo.prepare.
+        """
+        return geo.prepare(self.lat, self.lon)
+
+    @cached_property
+    def index(self):
+        """
+        spatial.SpatialIndex over the points, built on first use.
+        """
+        import spatial
+        return spatial.SpatialIndex(self.lat, self.lon, prepared = self.prepared)
+
+    @cached_property
+    def segment_lengths(self):
+        """
+        Haversine distance in meters from each point to the next.
+        """
+        return geo.segment_distances(self.prepared)
+
+    @cached_property
+    def cumulative_distance(self):
+        """
+        Distance in meters from the first point to every point.
+        """
+        final = np.zeros(len(self))
+        np.cumsum(self.segment_lengths, out = final[1:])
+        return final
+
+    def point(self, index):
+        lat = float(self.lat[index])
+        lon = float(self.lon[index])
+        if self.ele is None and self.time is None:
+            return (lat, lon)
+        ele = None if self.ele is None else float(self.ele[index])
+        if ele is not None and math.isnan(ele):
+            ele = None
+        if self.time is None:
+            return (lat, lon, ele)
+        return (lat, lon, ele, _to_datetime(self.time[index], self.timezone))
+
+    def iter_segments(self):
+        """
+        Yield each track segment as a Track that shares this one's columns.
+        """
+        ends = list(self.segments[1:]) + [len(self)]
+        for start, end in zip(self.segments, ends):
+            yield self[int(start):int(end)]
+
+    def _take(self, index):
+        if isinstance(index, slice) and index.step in (None, 1):
+            start, stop, _ = index.indices(len(self))
+            stop = max(start, stop)
+            keep = (self.segments >= start) & (self.segments < stop)
+            segments = self.segments[keep] - start
+        else:
+            if isinstance(index, slice):
+                positions = np.arange(len(self))[index]
+            else:
+                positions = np.asarray(index)
+                if positions.dtype == bool:
+                    positions = np.flatnonzero(positions)
+            if len(positions) and np.all(np.diff(positions) > 0):
+                segments = np.unique(np.searchsorted(positions, self.segments))
+                segments = segments[segments < len(positions)]
+            else:
+                segments = np.zeros(0, dtype = np.int64)
+        if len(segments) == 0 or segments[0] != 0:
+            segments = np.concatenate([[0], segments])
+        return Track(
+                name = self.name,
+                lat = self.lat[index],
+                lon = self.lon[index],
+                ele = None if self.ele is None else self.ele[index],
+                time = None if self.time is None else self.time[index],
+                segments = segments,
+                timezone = self.timezone)
+
+class PointsView(Sequence):
+    """
+    Read-only, tuple-compatible view of a Track's points.
+
+    Indexing gives the same (lat, lon, ele, time) tuples the old readers put
+    in their lists; slicing gives another PointsView without copying.
+    """
+
+    def __init__(self, track):
+        self.track = track
+
+    def __len__(self):
+        return len(self.track)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return PointsView(self.track[index])
+        if index < 0:
+            index += len(self.track)
+        if not 0 <= index < len(self.track):
+            raise IndexError('point index out of range')
+        return self.track.point(index)
+
+    def __iter__(self):
+        track = self.track
+        columns = [track.lat.tolist(), track.lon.tolist()]
+        if track.ele is not None or track.time is not None:
+            if track.ele is None:
+                columns.append([None] * len(track))
+            else:
+                columns.append(elevations(track.ele))
+        if track.time is not None:
+            columns.append(datetimes(track.time, track.timezone))
+        return zip(*columns)
+
+    def __eq__(self, other):
+        if isinstance(other, PointsView):
+            other = list(other)
+        return list(self) == other
+
+    def __repr__(self):
+        return f'PointsView({list(self)!r})'
+
+def coordinates(points):
+    """
+    (lat, lon) float64 columns for a Track, a PointsView or a list of tuples.
+    """
+    if isinstance(points, PointsView):
+        points = points.track
+    if isinstance(points, Track):
+        return points.lat, points.lon
+    n = len(points)
+    lat = np.fromiter((i[0] for i in points), dtype = np.float64, count = n)
+    lon = np.fromiter((i[1] for i in points), dtype = np.float64, count = n)
+    return lat, lon
+
+def local_times(times, timezone = DEFAULT_TIMEZONE) -> np.ndarray:
+    """
+    Naive local datetime64[ms] column for a UTC time column.
+
+    The UTC offset is looked up once per distinct quarter hour, the
+    granularity of every timezone transition, instead of once per point.
+    A false timezone returns the UTC times unchanged.
+    """
+    times = np.asarray(times, dtype = TIME_DTYPE)
+    if not timezone:
+        return times
+    import pytz
+    tz = pytz.timezone(timezone)
+    quarter = 15 * 60 * 1000
+    valid = ~np.isnat(times)
+    ms = times[valid].astype(np.int64)
+    buckets, inverse = np.unique(ms // quarter, return_inverse = True)
+    offsets = []
+    for i in buckets.tolist():
+        dt = _EPOCH + datetime.timedelta(milliseconds = i * quarter)
+        offsets.append(int(dt.astimezone(tz).utcoffset().total_seconds()) * 1000)
+    final = times.copy()
+    final[valid] = (ms + np.array(offsets, dtype = np.int64)[inverse]).astype(TIME_DTYPE)
+    return final
+
+def elevations(ele) -> list:
+    """
+    ele as a list, None where it is NaN.
+    """
+    missing = np.isnan(ele)
+    if not missing.any():
+        return ele.tolist()
+    return [None if m else v for v, m in zip(ele.tolist(), missing.tolist())]
+
+def datetimes(times, timezone = DEFAULT_TIMEZONE) -> list:
+    """
+    Aware datetimes (None for NaT) of a UTC time column, in timezone, the
+    same values _to_datetime gives one by one.
+
+    The column is shifted to local time once by local_times; pytz is then
+    asked for a tzinfo once per distinct UTC offset, not once per point.
+    """
+    times = np.asarray(times, dtype = TIME_DTYPE)
+    if not timezone:
+        return [None if i is None else i.replace(tzinfo = datetime.timezone.utc)
+                for i in times.tolist()]
+    local = local_times(times, timezone = timezone)
+    valid = ~np.isnat(times)
+    offsets = np.zeros(len(times), dtype = np.int64)
+    offsets[valid] = local[valid].astype(np.int64) - times[valid].astype(np.int64)
+    tzinfos = {}
+    for offset in np.unique(offsets[valid]).tolist():
+        first = int(np.flatnonzero(valid & (offsets == offset))[0])
+        tzinfos[offset] = _to_datetime(times[first], timezone).tzinfo
+    return [None if dt is None else dt.replace(tzinfo = tzinfos[offset])
+            for dt, offset in zip(local.tolist(), offsets.tolist())]
+
+def _to_datetime64(value):
+    if value is None:
+        return np.datetime64('NaT')
+    if isinstance(value, datetime.datetime) and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo = None)
+    return np.datetime64(value, 'ms')
+
+def _to_datetime(value, convert_timezone = DEFAULT_TIMEZONE):
+    if np.isnat(value):
+        return None
+    ms = int(value.astype(np.int64))
+    dt = _EPOCH + datetime.timedelta(milliseconds = ms)
+    if convert_timezone:
+        import pytz
+        dt = dt.astimezone(pytz.timezone(convert_timezone))
+    return dt
@@ -0,0 +1,93 @@
+import heapq
+import math
+
+import numpy as np
+
+from geo import EARTH_RADIUS
+from track import coordinates
+
+class VisvalingamError(Exception):
+    pass
+
+def project(lats, lons) -> tuple:
+    """
+    x, y in meters on a sinusoidal projection centered on the first point.
+    The projection is equal-area, so triangle areas on it are areas on the
+    ground.
+    """
+    lats = np.asarray(lats, dtype = float)
+    lons = np.asarray(lons, dtype = float)
+    lat_r = np.radians(lats)
+    d_lon = np.radians((lons - lons[0] + 180) % 360 - 180)
+    return d_lon * np.cos(lat_r) * EARTH_RADIUS, lat_r * EARTH_RADIUS
+
+def _area(x, y, a, b, c):
+    return abs((x[b] - x[a]) * (y[c] - y[a]) - (x[c] - x[a]) * (y[b] - y[a])) / 2
+
+def triangle_areas(x, y) -> np.ndarray:
+    """
+    Area in square meters of the triangle every interior point makes with
+    its two neighbours; n points give n - 2 areas.
+    """
+    return np.abs((x[1:-1] - x[:-2]) * (y[2:] - y[:-2]) -
+            (x[2:] - x[:-2]) * (y[1:-1] - y[:-2])) / 2
+
+def simplify_mask(lats, lons, target: int = None, area: float = None) -> np.ndarray:
+    """
+    Visvalingam-Whyatt simplification; returns a boolean mask of the points
+    to keep.
+
+    The point making the smallest triangle with its neighbours is removed
+    first, and the triangles of its two neighbours are recomputed. A point's
+    area never drops below that of a point removed before it, so the order
+    of removal is also the order of importance. Removal stops once only
+    target points are left or once every remaining triangle is at least area
+    square meters, whichever comes first. The end points are always kept.
+
+    The candidates are kept in a heap; recomputed areas are pushed as new
+    entries and stale ones are skipped when popped.
+    """
+    if target is None and area is None:
+        raise VisvalingamError('one of target or area is required')
+    if target is not None and target < 2:
+        raise VisvalingamError('target must be at least 2')
+    n = len(lats)
+    if n < 3:
+        return np.ones(n, dtype = bool)
+    x, y = project(lats, lons)
+    x = x.tolist()
+    y = y.tolist()
+    areas = [math.inf] + triangle_areas(np.array(x), np.array(y)).tolist() + [math.inf]
+    previous = list(range(-1, n - 1))
+    following = list(range(1, n + 1))
+    heap = [(areas[i], i) for i in range(1, n - 1)]
+    heapq.heapify(heap)
+    keep = [True] * n
+    remaining = n
+    while heap:
+        if target is not None and remaining <= target:
+            break
+        a, i = heapq.heappop(heap)
+        if not keep[i] or a != areas[i]:
+            continue
+        if area is not None and a >= area:
+            break
+        keep[i] = False
+        remaining -= 1
+        before = previous[i]
+        after = following[i]
+        following[before] = after
+        previous[after] = before
+        for j in (before, after):
+            if j == 0 or j == n - 1:
+                continue
+            areas[j] = max(a, _area(x, y, previous[j], j, following[j]))
+            heapq.heappush(heap, (areas[j], j))
+    return np.array(keep, dtype = bool)
+
+def simplify(points, target: int = None, area: float = None) -> list:
+    if len(points) < 3:
+        return list(points)
+    lats, lons = coordinates(points)
+    keep = simplify_mask(lats, lons, target = target, area = area)
+    return [points[i] for i in np.flatnonzero(keep)]
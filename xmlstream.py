@@ -0,0 +1,97 @@
+from xml.sax.saxutils import escape, quoteattr
+
+try:
+    from lxml import etree
+except ImportError:
+    import xml.etree.ElementTree as etree
+
+import atomic
+
+class XmlStreamError(Exception):
+    pass
+
+class XmlStreamWriter:
+    """
+    Write an xml document to path piece by piece instead of building the
+    whole tree and serializing it at once.
+
+    root is an element as kml.make_write_root or gpx.make_write_root make it;
+    only its tag and attributes are written. Children are added with
+    element() (serialized and then free to be dropped), start()/end() for
+    containers and text()/raw() for content written in chunks. The output is
+    byte for byte what tools.write_to_path gives for the same tree.
+
+    The document is written through atomic.replacing, so path is only
+    replaced when the block ends without an error.
+
+        with XmlStreamWriter(path, kml.make_write_root()) as writer:
+            writer.start('Folder')
+            for line in lines:
+                writer.element(line)
+            writer.end()
+    """
+
+    def __init__(self, path, root, verbose = False):
+        self.path = path
+        self.root = root
+        self.verbose = verbose
+        self._stack = []
+        self._open_tag = False
+        self._write_obj = None
+        self._file = None
+
+    def __enter__(self):
+        self._file = atomic.replacing(self.path, 'wb')
+        self._write_obj = self._file.__enter__()
+        self.start(self.root.tag, self.root.attrib)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            try:
+                while self._stack:
+                    self.end()
+            except BaseException as e:
+                self._file.__exit__(type(e), e, e.__traceback__)
+                raise
+        self._file.__exit__(exc_type, exc_value, traceback)
+        if exc_type is None and self.verbose:
+            print(f'wrote to {self.path}')
+        return False
+
+    def _write(self, s):
+        if self._open_tag:
+            self._write_obj.write(b'>')
+            self._open_tag = False
+        if isinstance(s, str):
+            s = s.encode('ascii', 'xmlcharrefreplace')
+        self._write_obj.write(s)
+
+    def start(self, tag, attrib = None):
+        attributes = ''.join(f' {k}={quoteattr(str(v))}'
+                for k, v in (attrib or {}).items())
+        self._write(f'<{tag}{attributes}')
+        self._open_tag = True
+        self._stack.append(tag)
+
+    def end(self):
+        if not self._stack:
+            raise XmlStreamError('no open element to end')
+        tag = self._stack.pop()
+        if self._open_tag:
+            self._write_obj.write(b'/>')
+            self._open_tag = False
+        else:
+            self._write(f'</{tag}>')
+
+    def element(self, element):
+        self._write(etree.tostring(element))
+
+    def text(self, s):
+        self._write(escape(s))
+
+    def raw(self, s):
+        """
+        Write already serialized markup as is.
+        """
+        self._write(s)